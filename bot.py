@@ -1,26 +1,64 @@
 import os
 import discord
 import sys
+import time
+from utils.command_sync import sync_if_changed
+from utils.profile import PROFILE, client_options
+from utils.cluster import CLUSTER, is_primary, sharding_options
+
+STARTED = time.perf_counter()
 
 TOKEN = os.getenv("TOKEN")
 if not TOKEN:
     print("❌ TOKEN manquant", file=sys.stderr)
     sys.exit(1)
 
-intents = discord.Intents.all()
-bot = discord.Bot(intents=intents)
+EXTENSIONS = [
+    f"cogs.{filename[:-3]}" for filename in sorted(os.listdir("./cogs"))
+    if filename.endswith(".py") and filename != "__init__.py"
+]
+# SEIKO_PROFILE=lean : intents déclarés par les cogs, cache membres réduit
+options = client_options(EXTENSIONS)
+# SEIKO_GUILDS=id1,id2 : commandes enregistrées par serveur (instantané) plutôt qu'en global
+guild_ids = [int(g) for g in os.getenv("SEIKO_GUILDS", "").split(",") if g.strip().isdigit()]
+# SEIKO_SHARDS=auto|N : plusieurs connexions gateway (voir utils/cluster.py)
+shards = sharding_options()
+if shards is not None:
+    options.update(shards)
+BotClass = discord.AutoShardedBot if shards is not None else discord.Bot
+# Synchro gérée ici, une fois par processus et seulement si les commandes ont changé
+bot = BotClass(auto_sync_commands=False, debug_guilds=guild_ids or None, **options)
+synced = False
 
 @bot.event
 async def on_ready():
-    print("✅ Seïko en ligne.")
-    await bot.sync_commands()  # ← OBLIGATOIRE
-    print("🌐 Commandes synchronisées.")
-
-for filename in os.listdir("./cogs"):
-    if filename.endswith(".py") and filename != "__init__.py":
-        try:
-            bot.load_extension(f"cogs.{filename[:-3]}")
-        except Exception as e:
-            print(f"❌ Erreur {filename}: {e}")
-
-bot.run(TOKEN)
\ No newline at end of file
+    global synced
+    if synced:
+        print("✅ Seïko reconnecté.")
+        return
+    synced = True
+    print(f"✅ Seïko en ligne en {time.perf_counter() - STARTED:.1f}s.")
+    started = time.perf_counter()
+    # Seul le cluster 0 envoie les commandes ; les autres lient seulement leurs IDs
+    scopes = await sync_if_changed(bot, upload=is_primary())
+    if scopes:
+        print(f"🌐 Synchronisation terminée en {time.perf_counter() - started:.2f}s.")
+    else:
+        print("🌐 Commandes inchangées, pas de synchronisation.")
+
+@bot.event
+async def on_shard_ready(shard_id):
+    print(f"🧩 Shard {shard_id} prêt (cluster {CLUSTER or 0}).")
+
+@bot.event
+async def on_shard_disconnect(shard_id):
+    print(f"⚠️ Shard {shard_id} déconnecté (cluster {CLUSTER or 0}).")
+
+for extension in EXTENSIONS:
+    try:
+        bot.load_extension(extension)
+    except Exception as e:
+        print(f"❌ Erreur {extension}: {e}")
+print(f"📦 Cogs chargés en {time.perf_counter() - STARTED:.2f}s (profil {PROFILE}).")
+
+bot.run(TOKEN)
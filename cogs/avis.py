@@ -1,44 +1,161 @@
 import discord
 from discord.ext import commands
+from utils.storage import get_store, AppendLog
+import asyncio
+import hashlib
 import json
 import os
+import time
 
-def load_json(path, default):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            return json.loads(content) if content else default
-    return default
+# Intents requis par ce cog (profil lean, voir utils/profile.py)
+INTENTS = ("guilds",)
 
-def save_json(path, data):
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+REVIEWS_DIR = "data/avis"
+PAGE_SIZE = 10
+# Un avis par membre et par période ; le même texte n'est jamais accepté deux fois de suite.
+COOLDOWN = 24 * 3600
+
+def empty_stats():
+    # "pages" : position dans le journal de chaque bloc de PAGE_SIZE avis
+    return {"sum": 0, "count": 0, "hist": [0] * 5, "bytes": 0, "pages": [], "users": {}}
 
 class AvisSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.data_path = "data/avis.json"
-        self.avis = load_json(self.data_path, {})
+        self.store = get_store(self.data_path, {})
+        self.avis = self.store.data
+        self.logs = {}
+        for gid, entries in list(self.avis.items()):
+            if isinstance(entries, list):
+                # ✅ Anciennes listes d'avis : versées une fois dans le journal, en une écriture
+                self.avis[gid] = empty_stats()
+                self.log(gid).extend([self.account(gid, entry) for entry in entries])
+                self.store.save()
+            elif self.log_size(gid) != entries["bytes"]:
+                # Arrêt brutal entre les deux écritures : positions recalculées depuis le journal
+                self.rebuild(gid)
+
+    def log(self, gid):
+        log = self.logs.get(gid)
+        if log is None:
+            log = self.logs[gid] = AppendLog(os.path.join(REVIEWS_DIR, f"{gid}.log"))
+        return log
+
+    def log_size(self, gid):
+        path = self.log(gid).path
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def account(self, gid, entry, line=None):
+        """Ajoute l'avis aux agrégats et retourne sa ligne de journal."""
+        stats = self.avis.setdefault(gid, empty_stats())
+        if stats["count"] % PAGE_SIZE == 0:
+            stats["pages"].append(stats["bytes"])
+        line = line or json.dumps(entry, ensure_ascii=False)
+        stats["bytes"] += len(line.encode("utf-8")) + 1
+        stats["sum"] += entry["stars"]
+        stats["count"] += 1
+        stats["hist"][entry["stars"] - 1] += 1
+        return line
+
+    def record(self, gid, entry):
+        self.log(gid).append(self.account(gid, entry))
+        self.store.save()
+
+    def rebuild(self, gid):
+        users = self.avis[gid].get("users", {})
+        stats = self.avis[gid] = empty_stats()
+        stats["users"] = users
+        path = self.log(gid).path
+        if os.path.exists(path):
+            with open(path, "rb+") as f:
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        # Fin de journal à moitié écrite : coupée pour que l'ajout suivant reparte propre
+                        f.truncate(stats["bytes"])
+                        break
+                    try:
+                        line = raw.decode("utf-8").rstrip("\n")
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Ligne tronquée : elle garde sa place dans le fichier, sans compter
+                        stats["bytes"] += len(raw)
+                        continue
+                    self.account(gid, entry, line)
+        self.store.save()
+
+    def _read_page(self, path, offset, skip, count):
+        with open(path, "r", encoding="utf-8") as f:
+            f.seek(offset)
+            lines = []
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                lines.append(entry)
+                if len(lines) >= count:
+                    break
+        return lines
+
+    async def read_page(self, gid, page):
+        """Avis de la page `page` (1 = les plus récents), sans relire tout l'historique."""
+        stats = self.avis[gid]
+        end = stats["count"] - (page - 1) * PAGE_SIZE
+        start = max(end - PAGE_SIZE, 0)
+        log = self.log(gid)
+        await log.flush()
+        block, skip = divmod(start, PAGE_SIZE)
+        entries = await asyncio.to_thread(self._read_page, log.path, stats["pages"][block], skip, end - start)
+        return list(reversed(entries))
 
     @commands.slash_command(name="avis", description="Donner un avis")
     async def avis(self, ctx, étoiles: discord.Option(int, min_value=1, max_value=5), description: str):
         gid = str(ctx.guild.id)
-        if gid not in self.avis:
-            self.avis[gid] = []
-        self.avis[gid].append({"user": str(ctx.author.id), "stars": étoiles, "desc": description})
-        save_json(self.data_path, self.avis)
+        uid = str(ctx.author.id)
+        # ✅ Anti-flood : délai par membre et pas deux fois le même texte
+        digest = hashlib.sha1(description.strip().lower().encode("utf-8")).hexdigest()[:12]
+        last = self.avis.get(gid, {}).get("users", {}).get(uid)
+        now = int(time.time())
+        if last and last["hash"] == digest:
+            return await ctx.respond("❌ Vous avez déjà envoyé cet avis.", ephemeral=True)
+        if last and now - last["ts"] < COOLDOWN:
+            return await ctx.respond(f"⏳ Prochain avis possible <t:{last['ts'] + COOLDOWN}:R>.", ephemeral=True)
+
+        self.record(gid, {"user": uid, "stars": étoiles, "desc": description, "ts": now})
+        self.avis[gid]["users"][uid] = {"ts": now, "hash": digest}
         stars_display = "⭐" * étoiles + "☆" * (5 - étoiles)
         await ctx.respond(f"✅ Avis soumis :\n{stars_display}\n\"{description}\"")
 
     @commands.slash_command(name="avis_stat", description="Voir la moyenne des avis")
     async def avis_stat(self, ctx):
         gid = str(ctx.guild.id)
-        if gid not in self.avis or not self.avis[gid]:
+        stats = self.avis.get(gid)
+        if not stats or not stats["count"]:
+            return await ctx.respond("📭 Aucun avis.")
+        avg = stats["sum"] / stats["count"]
+        bars = "\n".join(f"{'⭐' * (i + 1):<5} `{n}`" for i, n in reversed(list(enumerate(stats["hist"]))))
+        await ctx.respond(f"⭐ **Moyenne des avis** : {avg:.2f}/5 ({stats['count']} avis)\n{bars}")
+
+    @commands.slash_command(name="avis_list", description="Lire les avis, page par page")
+    async def avis_list(self, ctx, page: discord.Option(int, min_value=1, required=False, default=1)):
+        gid = str(ctx.guild.id)
+        stats = self.avis.get(gid)
+        if not stats or not stats["count"]:
             return await ctx.respond("📭 Aucun avis.")
-        total = sum(item["stars"] for item in self.avis[gid])
-        avg = total / len(self.avis[gid])
-        await ctx.respond(f"⭐ **Moyenne des avis** : {avg:.2f}/5 ({len(self.avis[gid])} avis)")
+        pages = -(-stats["count"] // PAGE_SIZE)
+        if page > pages:
+            return await ctx.respond(f"❌ Page `{page}` introuvable ({pages} page(s)).", ephemeral=True)
+        lines = []
+        for entry in await self.read_page(gid, page):
+            stars = "⭐" * entry["stars"] + "☆" * (5 - entry["stars"])
+            lines.append(f"{stars} <@{entry['user']}>\n\"{entry['desc'][:200]}\"")
+        embed = discord.Embed(title="📝 Avis", description="\n\n".join(lines), color=0x5865F2)
+        embed.set_footer(text=f"Page {page}/{pages} • {stats['count']} avis")
+        await ctx.respond(embed=embed, ephemeral=True)
 
 def setup(bot):
-    bot.add_cog(AvisSystem(bot))
\ No newline at end of file
+    bot.add_cog(AvisSystem(bot))
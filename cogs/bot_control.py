@@ -1,10 +1,32 @@
 # cogs/bot_control.py
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+from utils.rest import get_rest, COMMUNITY
+from utils import cluster
+
+# Intents requis par ce cog (profil lean, voir utils/profile.py)
+INTENTS = ("guilds",)
 
 class BotControl(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.rest = get_rest()
+
+    def cog_unload(self):
+        self.report_health.cancel()
+
+    @tasks.loop(seconds=cluster.HEALTH_INTERVAL)
+    async def report_health(self):
+        # ✅ Mode cluster : chaque processus publie l'état de ses shards
+        try:
+            cluster.write_health(self.bot)
+        except OSError as e:
+            print(f"❌ Rapport de santé : {e}")
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if cluster.CLUSTER is not None and not self.report_health.is_running():
+            self.report_health.start()
 
     @discord.slash_command(name="bot_on", description="Annoncer que le bot est en ligne")
     @commands.has_permissions(administrator=True)
@@ -12,21 +34,50 @@ class BotControl(commands.Cog):
         msg = "✅ **Le bot est de nouveau en ligne !**"
         if rajout:
             msg += f"\n> {rajout}"
-        await ctx.channel.send(msg)
+        await self.rest.send(COMMUNITY, ctx.channel, msg)
 
     @discord.slash_command(name="bot_off", description="Annoncer une maintenance")
     @commands.has_permissions(administrator=True)
     async def cmd_bot_off(self, ctx, raison: str, temps: str):
-        await ctx.channel.send(f"⚠️ **Maintenance prévue**\nRaison : {raison}\nTemps estimé : {temps}")
+        await self.rest.send(COMMUNITY, ctx.channel, f"⚠️ **Maintenance prévue**\nRaison : {raison}\nTemps estimé : {temps}")
 
     @discord.slash_command(name="bot_redem", description="Annoncer un redémarrage")
     @commands.has_permissions(administrator=True)
     async def cmd_bot_redem(self, ctx):
-        await ctx.channel.send("🔄 **Redémarrage en cours...**")
+        await self.rest.send(COMMUNITY, ctx.channel, "🔄 **Redémarrage en cours...**")
 
     @discord.slash_command(name="bot_ping", description="Voir la latence")
     async def cmd_bot_ping(self, ctx):
         await ctx.respond(f"🏓 Pong ! `{round(self.bot.latency * 1000)} ms`")
 
+    @discord.slash_command(name="bot_queue", description="Voir la file des appels Discord")
+    @commands.has_permissions(administrator=True)
+    async def cmd_bot_queue(self, ctx):
+        depth = self.rest.depth()
+        lines = [f"- {name} : `{n}`" for name, n in depth.items()] or ["- vide"]
+        await ctx.respond(
+            "📮 **File REST**\n" + "\n".join(lines) + f"\n⚙️ En cours : `{self.rest.inflight()}`",
+            ephemeral=True
+        )
+
+    @discord.slash_command(name="bot_shards", description="Voir l'état des shards")
+    @commands.has_permissions(administrator=True)
+    async def cmd_bot_shards(self, ctx):
+        if cluster.CLUSTER is None:
+            reports = [{"cluster": "0", "stale": False, "shards": cluster.shard_health(self.bot)}]
+        else:
+            cluster.write_health(self.bot)
+            reports = cluster.read_health()
+        lines = []
+        for report in reports:
+            state = " ⚠️ sans nouvelles" if report["stale"] else ""
+            lines.append(f"**Cluster {report['cluster']}**{state}")
+            for shard in report["shards"]:
+                icon = "🔴" if shard["closed"] else "🟢"
+                latency = "?" if shard["latency"] is None else shard["latency"]
+                lines.append(f"{icon} Shard `{shard['shard']}` : `{latency} ms`, `{shard['guilds']}` serveurs")
+        here = ctx.guild.shard_id if ctx.guild else 0
+        await ctx.respond("🧩 **Shards**\n" + "\n".join(lines) + f"\n📍 Ce serveur : shard `{here}`", ephemeral=True)
+
 def setup(bot):
     bot.add_cog(BotControl(bot))
\ No newline at end of file
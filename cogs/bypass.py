@@ -1,74 +1,184 @@
 import discord
 from discord.ext import commands
-import json
-import os
+from utils.storage import get_store
+from utils.rest import get_rest, MODERATION, BACKGROUND
+from utils.cluster import owns
+from collections import defaultdict
+import asyncio
+import re
 
-def load_json(path, default):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            return json.loads(content) if content else default
-    return default
+# Intents requis par ce cog (profil lean, voir utils/profile.py)
+INTENTS = ("guilds",)
 
-def save_json(path, data):
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+# Rôles rangés avec le préfixe "&" (comme dans <@&id>), membres avec leur ID seul.
+ROLE_PREFIX = "&"
+MENTION = re.compile(r"<@(!|&)?(\d+)>|\b(\d{15,20})\b")
+RECONCILE_CONCURRENCY = 4
+
+def bypass_overwrite():
+    return discord.PermissionOverwrite(view_channel=True, send_messages=True)
+
+def raw_overwrites(channel):
+    """Overwrites du salon par ID, membres hors cache compris (channel.overwrites les ignore)."""
+    result = {}
+    for ow in channel._overwrites:
+        target = channel.guild.get_role(ow.id) if ow.is_role() else discord.Object(id=ow.id)
+        if target is not None:
+            pair = (discord.Permissions(ow.allow), discord.Permissions(ow.deny))
+            result[ow.id] = (target, discord.PermissionOverwrite.from_pair(*pair))
+    return result
 
 class BypassSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.data_path = "data/bypass.json"
-        self.bypass_data = load_json(self.data_path, {})
+        self.store = get_store(self.data_path, {})
+        self.bypass_data = self.store.data
+        self.rest = get_rest()
+        self.reconciled = False
+        # ✅ Index inverse : membre -> salons où il a un accès forcé
+        self.by_user = defaultdict(set)
+        for guild_id, channels in self.bypass_data.items():
+            for channel_id, entries in channels.items():
+                for entry in entries:
+                    self.by_user[(guild_id, entry)].add(channel_id)
 
     def get_guild_data(self, guild_id):
         return self.bypass_data.get(str(guild_id), {})
 
     def set_guild_data(self, guild_id, data):
         self.bypass_data[str(guild_id)] = data
-        save_json(self.data_path, self.bypass_data)
+        self.store.save()
+
+    def add_entries(self, guild_id, channel_id, entries):
+        guild_data = self.get_guild_data(guild_id)
+        stored = guild_data.setdefault(channel_id, [])
+        for entry in entries:
+            if entry not in stored:
+                stored.append(entry)
+            self.by_user[(guild_id, entry)].add(channel_id)
+        self.set_guild_data(guild_id, guild_data)
+
+    def remove_entry(self, guild_id, channel_id, entry):
+        guild_data = self.get_guild_data(guild_id)
+        if channel_id in guild_data and entry in guild_data[channel_id]:
+            guild_data[channel_id].remove(entry)
+            if not guild_data[channel_id]:
+                del guild_data[channel_id]
+            self.set_guild_data(guild_id, guild_data)
+        channels = self.by_user.get((guild_id, entry))
+        if channels is not None:
+            channels.discard(channel_id)
+            if not channels:
+                del self.by_user[(guild_id, entry)]
+
+    async def member(self, guild, user_id):
+        # Le cache membres peut être partiel (profil lean) : on demande à l'API
+        member = guild.get_member(user_id)
+        if member is None and not guild.chunked:
+            try:
+                member = await self.rest.call(MODERATION, f"guilds/{guild.id}/members", guild.fetch_member, user_id)
+            except discord.NotFound:
+                return None
+        return member
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if not self.reconciled:
+            self.reconciled = True
+            await self.reconcile()
+
+    async def reconcile(self):
+        """Compare le JSON aux permissions réelles au démarrage.
+
+        Un accès absent du salon a été retiré volontairement (ou le salon
+        supprimé) : l'entrée est oubliée, jamais rétablie en silence. Un
+        serveur indisponible est laissé tel quel jusqu'au prochain démarrage.
+        """
+        limit = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+
+        async def check(guild_id, channel_id):
+            guild = self.bot.get_guild(int(guild_id))
+            if guild is None or guild.unavailable:
+                return
+            channel = guild.get_channel(int(channel_id))
+            if channel is None:
+                # ✅ Absent du cache ne veut pas dire supprimé : on demande à l'API
+                async with limit:
+                    try:
+                        channel = await self.rest.call(BACKGROUND, f"channels/{channel_id}",
+                                                       self.bot.fetch_channel, int(channel_id))
+                    except discord.NotFound:
+                        channel = None
+                    except discord.HTTPException as e:
+                        print(f"❌ Bypass {channel_id} : {e}")
+                        return
+            actual = raw_overwrites(channel) if channel else {}
+            for entry in list(self.get_guild_data(guild_id).get(channel_id, [])):
+                ow = actual.get(int(entry.lstrip(ROLE_PREFIX)), (None, None))[1]
+                if ow is None or not ow.view_channel or not ow.send_messages:
+                    print(f"ℹ️ Bypass {entry} sur {channel_id} retiré hors du bot : entrée supprimée.")
+                    self.remove_entry(guild_id, channel_id, entry)
+
+        await asyncio.gather(*(
+            check(guild_id, channel_id)
+            for guild_id, channels in list(self.bypass_data.items()) if owns(self.bot, guild_id)
+            for channel_id in list(channels)
+        ))
 
     bypass = discord.SlashCommandGroup("bypass", "Gérer les accès manuels")
 
-    @bypass.command(name="add", description="Donner l'accès à un membre dans un salon")
-    async def add(self, ctx, membre: discord.Member, salon: discord.TextChannel = None):
+    @bypass.command(name="add", description="Donner l'accès à des membres et rôles dans un salon")
+    @commands.has_permissions(manage_channels=True)
+    async def add(self, ctx, cibles: str, salon: discord.TextChannel = None):
+        """
+        cibles = mentions ou IDs de membres / rôles (plusieurs possibles)
+        """
         channel = salon or ctx.channel
         if not isinstance(channel, discord.TextChannel):
             return await ctx.respond("❌ Salon invalide.")
+
+        targets = {}
+        for kind, mention_id, raw_id in MENTION.findall(cibles):
+            target_id = int(mention_id or raw_id)
+            role = ctx.guild.get_role(target_id) if kind != "!" else None
+            if role and role.is_default():
+                return await ctx.respond("❌ Impossible de donner un bypass à @everyone.", ephemeral=True)
+            if role:
+                targets[ROLE_PREFIX + str(role.id)] = role
+            elif kind != "&":
+                member = await self.member(ctx.guild, target_id)
+                if member:
+                    targets[str(member.id)] = member
+        if not targets:
+            return await ctx.respond("❌ Aucun membre ou rôle valide.")
+
+        # ✅ Un seul appel pour toutes les cibles, sans perdre les overwrites des membres hors cache
+        current = raw_overwrites(channel)
+        for target in targets.values():
+            current[target.id] = (target, bypass_overwrite())
         try:
-            await channel.set_permissions(membre, view_channel=True, send_messages=True)
+            await self.rest.call(MODERATION, f"channels/{channel.id}", channel.edit, overwrites=dict(current.values()))
         except discord.Forbidden:
             return await ctx.respond("❌ Permission refusée.")
-        guild_id = str(ctx.guild.id)
-        channel_id = str(channel.id)
-        user_id = str(membre.id)
-        guild_data = self.get_guild_data(ctx.guild.id)
-        if channel_id not in guild_data:
-            guild_data[channel_id] = []
-        if user_id not in guild_data[channel_id]:
-            guild_data[channel_id].append(user_id)
-        self.set_guild_data(ctx.guild.id, guild_data)
-        await ctx.respond(f"✅ Accès accordé à {membre.mention} dans {channel.mention}.")
-
-    @bypass.command(name="del", description="Retirer l'accès d'un membre")
-    async def delete(self, ctx, membre: discord.Member, salon: discord.TextChannel = None):
+        self.add_entries(str(ctx.guild.id), str(channel.id), list(targets))
+        mentions = ", ".join(t.mention for t in targets.values())
+        await ctx.respond(f"✅ Accès accordé à {mentions} dans {channel.mention}.")
+
+    @bypass.command(name="del", description="Retirer l'accès d'un membre ou d'un rôle")
+    @commands.has_permissions(manage_channels=True)
+    async def delete(self, ctx, cible: discord.Option(discord.abc.Mentionable, "Membre ou rôle"),
+                     salon: discord.TextChannel = None):
         channel = salon or ctx.channel
         if not isinstance(channel, discord.TextChannel):
             return await ctx.respond("❌ Salon invalide.")
+        entry = (ROLE_PREFIX if isinstance(cible, discord.Role) else "") + str(cible.id)
         try:
-            await channel.set_permissions(membre, overwrite=None)
+            await self.rest.call(MODERATION, f"channels/{channel.id}", channel.set_permissions, cible, overwrite=None)
         except discord.Forbidden:
             return await ctx.respond("❌ Permission refusée.")
-        guild_id = str(ctx.guild.id)
-        channel_id = str(channel.id)
-        user_id = str(membre.id)
-        guild_data = self.get_guild_data(ctx.guild.id)
-        if channel_id in guild_data and user_id in guild_data[channel_id]:
-            guild_data[channel_id].remove(user_id)
-            if not guild_data[channel_id]:
-                del guild_data[channel_id]
-            self.set_guild_data(ctx.guild.id, guild_data)
-        await ctx.respond(f"✅ Accès retiré à {membre.mention}.")
+        self.remove_entry(str(ctx.guild.id), str(channel.id), entry)
+        await ctx.respond(f"✅ Accès retiré à {cible.mention}.")
 
     @bypass.command(name="list", description="Lister les membres avec accès forcé")
     async def list_bypass(self, ctx, salon: discord.TextChannel = None):
@@ -77,15 +187,22 @@ class BypassSystem(commands.Cog):
         channel_id = str(channel.id)
         if channel_id not in guild_data or not guild_data[channel_id]:
             return await ctx.respond("📭 Aucun membre avec accès forcé.")
-        members = []
-        for uid in guild_data[channel_id]:
-            member = ctx.guild.get_member(int(uid))
-            if member:
-                members.append(f"- {member.mention}")
-            else:
-                members.append(f"- ID: {uid}")
+        # <@id> pour un membre, <@&id> pour un rôle : pas besoin du cache
+        members = [f"- <@{entry}>" for entry in guild_data[channel_id]]
         embed = discord.Embed(title="🔐 Membres en bypass", description="\n".join(members), color=0x5865F2)
         await ctx.respond(embed=embed)
 
+    @bypass.command(name="user", description="Salons où un membre a un accès forcé")
+    async def user(self, ctx, membre: discord.Member):
+        channels = self.by_user.get((str(ctx.guild.id), str(membre.id)))
+        if not channels:
+            return await ctx.respond(f"📭 Aucun accès forcé pour {membre.mention}.")
+        embed = discord.Embed(
+            title=f"🔐 Bypass — {membre.display_name}",
+            description="\n".join(f"- <#{cid}>" for cid in sorted(channels)),
+            color=0x5865F2
+        )
+        await ctx.respond(embed=embed)
+
 def setup(bot):
-    bot.add_cog(BypassSystem(bot))
\ No newline at end of file
+    bot.add_cog(BypassSystem(bot))
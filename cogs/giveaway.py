@@ -1,72 +1,312 @@
 # cogs/giveaway.py
 import discord
 from discord.ext import commands
-import json
+from utils.storage import get_store, AppendLog, FLUSH_DELAY
+from utils.database import get_database
+from utils.scheduler import DeadlineScheduler
+from utils.rest import get_rest, COMMUNITY
+from utils import components
+from utils.cluster import owns
+import asyncio
+import atexit
 import os
 import random
 import re
+import time
 from datetime import datetime, timedelta, timezone
 
-def load_json(path, default):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            return json.loads(content) if content else default
-    return default
-
-def save_json(path, data):
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+# Intents requis par ce cog (profil lean, voir utils/profile.py)
+INTENTS = ("guilds",)
+
+GIVEAWAYS_PATH = "data/giveaways.json"
+ENTRIES_DIR = "data/giveaway_entries"
+# Annonce impossible : nouvel essai, délai doublé à chaque échec
+ANNOUNCE_RETRY = 60
+ANNOUNCE_RETRY_MAX = 6 * 3600
+
+class GiveawayStore:
+    """Giveaways rangés par serveur, dans le JSON ou dans SQLite.
+
+    Les participants vivent dans un set en mémoire par giveaway ; les nouvelles
+    entrées sont regroupées puis ajoutées à un journal (fichier ou table SQLite).
+    """
+
+    def __init__(self):
+        self.store = get_store(GIVEAWAYS_PATH, {})
+        self.data = self.store.data
+        self.db = get_database()
+        self._cache = {}
+        self._entries = {}
+        self._logs = {}
+        self._pending = []
+        self._handle = None
+        if self.db:
+            atexit.register(self.flush_entries)
+
+    def get(self, guild_id, giveaway_id):
+        if self.db:
+            key = (guild_id, giveaway_id)
+            if key not in self._cache:
+                self._cache[key] = self.db.get_giveaway(guild_id, giveaway_id)
+            return self._cache[key]
+        return self.data.get(guild_id, {}).get(giveaway_id)
+
+    def create(self, guild_id, giveaway_id, giveaway):
+        if self.db:
+            return self.db.create_giveaway(guild_id, giveaway_id, giveaway)
+        self.data.setdefault(guild_id, {})[giveaway_id] = giveaway
+        self.store.save()
+
+    def set_ended(self, guild_id, giveaway_id):
+        if self.db:
+            self._cache.pop((guild_id, giveaway_id), None)
+            return self.db.set_giveaway_ended(guild_id, giveaway_id)
+        self.data[guild_id][giveaway_id]["ended"] = True
+        self.store.save()
+
+    def _log(self, key):
+        log = self._logs.get(key)
+        if log is None:
+            log = self._logs[key] = AppendLog(os.path.join(ENTRIES_DIR, f"{key[0]}_{key[1]}.log"))
+        return log
+
+    def _participant_set(self, guild_id, giveaway_id):
+        key = (guild_id, giveaway_id)
+        entries = self._entries.get(key)
+        if entries is None:
+            if self.db:
+                entries = set(self.db.get_participants(guild_id, giveaway_id))
+                entries.update(uid for g, gw, uid in self._pending if (g, gw) == key)
+            else:
+                # Anciens giveaways : participants encore stockés dans le JSON.
+                entries = set(self.data[guild_id][giveaway_id].get("participants", []))
+                entries.update(self._log(key).read_lines())
+            self._entries[key] = entries
+        return entries
+
+    def add_participant(self, guild_id, giveaway_id, user_id):
+        # Aucun await ici : vérification et ajout sont atomiques pour la boucle.
+        entries = self._participant_set(guild_id, giveaway_id)
+        if user_id in entries:
+            return False
+        entries.add(user_id)
+        if self.db:
+            self._pending.append((guild_id, giveaway_id, user_id))
+            self._schedule_db_flush()
+        else:
+            self._log((guild_id, giveaway_id)).append(user_id)
+        return True
+
+    def _schedule_db_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.flush_entries()
+        if self._handle is None:
+            self._handle = loop.call_later(FLUSH_DELAY, self.flush_entries)
+
+    def flush_entries(self):
+        self._handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            self.db.insert_participants(pending)
+
+    def participants(self, guild_id, giveaway_id):
+        return list(self._participant_set(guild_id, giveaway_id))
+
+    def list(self, guild_id):
+        if self.db:
+            return self.db.list_giveaways(guild_id)
+        return self.data.get(guild_id, {})
+
+    def pending(self):
+        if self.db:
+            return self.db.pending_giveaways()
+        return [(gid, gwid, gw["end_time"])
+                for gid, guild_giveaways in self.data.items()
+                for gwid, gw in guild_giveaways.items() if not gw.get("ended", False)]
+
+_giveaways = None
+
+def get_giveaways():
+    global _giveaways
+    if _giveaways is None:
+        _giveaways = GiveawayStore()
+    return _giveaways
 
 # === BOUTON PARTICIPER ===
+JOIN_ID = "gw:join"
+LEGACY_JOIN_PREFIX = "gw_join_"
+# Vues vivantes par giveaway, libérées à la fin du tirage
+LIVE_VIEWS = {}
+
+def track_views(giveaway_id, *views):
+    router = components.get_router()
+    for view in views:
+        router.track(view)
+    LIVE_VIEWS.setdefault(giveaway_id, []).extend(views)
+
+def release_views(giveaway_id):
+    router = components.get_router()
+    for view in LIVE_VIEWS.pop(giveaway_id, []):
+        router.release(view)
+
 class GiveawayView(discord.ui.View):
     def __init__(self, giveaway_id):
         super().__init__(timeout=None)  # Jamais expiré
         self.giveaway_id = giveaway_id
-        self.add_item(discord.ui.Button(
+        self.add_item(components.RoutedButton(
             label="🎉 Participer",
             style=discord.ButtonStyle.green,
-            custom_id=f"gw_join_{giveaway_id}"
+            custom_id=components.custom_id(JOIN_ID, giveaway_id)
         ))
 
-# === ÉCOUTEUR GLOBAL POUR LE BOUTON ===
+def legacy_join_button(giveaway_id):
+    """Boutons publiés avant le routeur (custom_id `gw_join_<id>`), routés par alias."""
+    return components.RoutedButton(
+        label="🎉 Participer", style=discord.ButtonStyle.green, custom_id=f"{LEGACY_JOIN_PREFIX}{giveaway_id}"
+    )
+
+# === BOUTON PERSISTANT : ré-enregistré à chaque démarrage ===
 class GiveawayHandler(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.giveaways = get_giveaways()
+        router = components.get_router()
+        router.register(JOIN_ID, self.join)
+        router.alias(LEGACY_JOIN_PREFIX, JOIN_ID)
+        router.attach(bot)
+        self.views_added = False
 
     @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.Interaction):
-        if interaction.type != discord.InteractionType.component:
-            return
-        custom_id = interaction.data.get("custom_id", "")
-        if not custom_id.startswith("gw_join_"):
+    async def on_ready(self):
+        # Les vues se construisent avec une boucle active : pas dans __init__ (load_extension)
+        if self.views_added:
             return
-
-        giveaway_id = custom_id.replace("gw_join_", "")
+        self.views_added = True
+        for guild_id, giveaway_id, _ in self.giveaways.pending():
+            if not owns(self.bot, guild_id):
+                continue
+            views = (GiveawayView(giveaway_id), components.persistent_view(legacy_join_button(giveaway_id)))
+            track_views(giveaway_id, *views)
+            for view in views:
+                self.bot.add_view(view)
+
+    async def join(self, interaction: discord.Interaction, giveaway_id):
         guild_id = str(interaction.guild.id)
-        giveaways = load_json("data/giveaways.json", {})
+        giveaway = self.giveaways.get(guild_id, giveaway_id)
 
-        if guild_id not in giveaways or giveaway_id not in giveaways[guild_id]:
+        if giveaway is None:
             return await interaction.response.send_message("❌ Ce giveaway n'existe plus.", ephemeral=True)
 
-        giveaway = giveaways[guild_id][giveaway_id]
         if giveaway.get("ended", False):
             return await interaction.response.send_message("✅ Ce giveaway est terminé.", ephemeral=True)
 
-        user_id = str(interaction.user.id)
-        if user_id in giveaway["participants"]:
+        # Ajoute le participant en mémoire ; l'écriture disque part en lot, après la réponse
+        if not self.giveaways.add_participant(guild_id, giveaway_id, str(interaction.user.id)):
             return await interaction.response.send_message("✅ Vous participez déjà !", ephemeral=True)
-
-        # Ajoute le participant
-        giveaway["participants"].append(user_id)
-        save_json("data/giveaways.json", giveaways)
         await interaction.response.send_message("✅ Participation enregistrée !", ephemeral=True)
 
 # === SYSTÈME PRINCIPAL ===
 class GiveawaySystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.giveaways = get_giveaways()
+        self.rest = get_rest()
+        # ✅ Fin automatique : un seul timer pour tous les giveaways en cours
+        self.scheduler = DeadlineScheduler(self.auto_end)
+        for guild_id, giveaway_id, end_time in self.giveaways.pending():
+            # Mode cluster : seuls les serveurs de nos shards
+            if owns(bot, guild_id):
+                self.scheduler.schedule((guild_id, giveaway_id), end_time)
+        self.finishing = set()
+        self.finish_attempts = {}
+
+    def cog_unload(self):
+        self.scheduler.stop()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Les giveaways expirés pendant l'arrêt sont tirés dès maintenant.
+        self.scheduler.ensure_started()
+
+    async def auto_end(self, key):
+        guild_id, giveaway_id = key
+        await self.finish(guild_id, giveaway_id)
+
+    async def draw(self, guild, guild_id, giveaway_id, count):
+        # ✅ Ordre aléatoire puis vérification une à une : on s'arrête dès qu'on a
+        # assez de gagnants, sans dépendre d'un cache membres complet.
+        candidates = list(self.giveaways.participants(guild_id, giveaway_id))
+        random.shuffle(candidates)
+        winners = []
+        for uid in candidates:
+            if len(winners) >= count:
+                break
+            member = guild.get_member(int(uid))
+            if member is None and not guild.chunked:
+                try:
+                    member = await self.rest.call(
+                        COMMUNITY, f"guilds/{guild.id}/members", guild.fetch_member, int(uid)
+                    )
+                except discord.NotFound:
+                    member = None
+            if member:
+                winners.append(member)
+        return winners
+
+    async def finish(self, guild_id, giveaway_id):
+        """Termine le giveaway et annonce les gagnants. Retourne un message d'erreur ou None."""
+        giveaway = self.giveaways.get(guild_id, giveaway_id)
+        if giveaway is None:
+            return "❌ Giveaway introuvable."
+        if giveaway["ended"]:
+            return "✅ Ce giveaway est déjà terminé."
+        key = (guild_id, giveaway_id)
+        if key in self.finishing:
+            return "⏳ Tirage déjà en cours."
+        self.finishing.add(key)
+        self.scheduler.cancel(key)
+        try:
+            guild = self.bot.get_guild(int(guild_id))
+            if guild is not None and guild.unavailable:
+                return self.retry_finish(key, "serveur indisponible")
+            channel = guild.get_channel(int(giveaway["channel_id"])) if guild else None
+            if channel:
+                # Tirage
+                winners = await self.draw(channel.guild, guild_id, giveaway_id, giveaway["winners"])
+                if not winners:
+                    result = "❌ Aucun participant valide."
+                else:
+                    winner_mentions = " ".join([w.mention for w in winners])
+                    result = f"🎉 **Félicitations** : {winner_mentions} !"
+
+                embed = discord.Embed(
+                    title="🎁 **GIVEAWAY TERMINÉ**",
+                    description=f"**{giveaway['title']}**\n\n{result}",
+                    color=0x57F287
+                )
+                embed.set_footer(text="Merci d'avoir participé !")
+                await self.rest.send(COMMUNITY, channel, embed=embed)
+        except discord.HTTPException as e:
+            return self.retry_finish(key, e)
+        finally:
+            self.finishing.discard(key)
+
+        # ✅ Terminé seulement une fois annoncé (ou salon supprimé) : un échec est retenté plus tard
+        self.finish_attempts.pop(key, None)
+        self.giveaways.set_ended(guild_id, giveaway_id)
+        # Les clics suivants passent par le routeur, qui répond "terminé"
+        release_views(giveaway_id)
+        if not channel:
+            return "❌ Salon introuvable."
+
+    def retry_finish(self, key, reason):
+        attempts = self.finish_attempts[key] = self.finish_attempts.get(key, 0) + 1
+        delay = min(ANNOUNCE_RETRY * 2 ** (attempts - 1), ANNOUNCE_RETRY_MAX)
+        print(f"❌ Giveaway {key[1]} sur {key[0]} : {reason} (nouvel essai dans {delay}s)")
+        self.scheduler.schedule(key, time.time() + delay)
+        return f"❌ Annonce impossible, nouvel essai dans {delay}s."
 
     def parse_time(self, time_str):
         total = 0
@@ -89,13 +329,8 @@ class GiveawaySystem(commands.Cog):
         channel = salon or ctx.channel
 
         # Sauvegarde
-        giveaways = load_json("data/giveaways.json", {})
-        guild_id = str(ctx.guild.id)
-        if guild_id not in giveaways:
-            giveaways[guild_id] = {}
-
         giveaway_id = str(end_timestamp)
-        giveaways[guild_id][giveaway_id] = {
+        self.giveaways.create(str(ctx.guild.id), giveaway_id, {
             "title": titre,
             "description": description,
             "end_time": end_timestamp,
@@ -104,8 +339,8 @@ class GiveawaySystem(commands.Cog):
             "participants": [],
             "ended": False,
             "host": str(ctx.author.id)
-        }
-        save_json("data/giveaways.json", giveaways)
+        })
+        self.scheduler.schedule((str(ctx.guild.id), giveaway_id), end_timestamp)
 
         # Embed stylé
         embed = discord.Embed(
@@ -119,62 +354,27 @@ class GiveawaySystem(commands.Cog):
         embed.set_footer(text="Cliquez sur 🎉 Participer pour tenter votre chance !")
 
         view = GiveawayView(giveaway_id)
-        await channel.send(embed=embed, view=view)
+        track_views(giveaway_id, view)
+        await self.rest.send(COMMUNITY, channel, embed=embed, view=view)
         await ctx.respond(f"✅ Giveaway lancé dans {channel.mention}.", ephemeral=True)
 
     @giveaway.command(name="end", description="Terminer un giveaway maintenant")
     @commands.has_permissions(manage_guild=True)
     async def end(self, ctx, giveaway_id: str):
-        giveaways = load_json("data/giveaways.json", {})
-        guild_id = str(ctx.guild.id)
-
-        if guild_id not in giveaways or giveaway_id not in giveaways[guild_id]:
-            return await ctx.respond("❌ Giveaway introuvable.", ephemeral=True)
-
-        giveaway = giveaways[guild_id][giveaway_id]
-        if giveaway["ended"]:
-            return await ctx.respond("✅ Ce giveaway est déjà terminé.", ephemeral=True)
-
-        giveaway["ended"] = True
-        save_json("data/giveaways.json", giveaways)
-
-        channel = self.bot.get_channel(int(giveaway["channel_id"]))
-        if not channel:
-            return await ctx.respond("❌ Salon introuvable.", ephemeral=True)
-
-        # Tirage
-        valid_participants = []
-        for uid in giveaway["participants"]:
-            member = channel.guild.get_member(int(uid))
-            if member:
-                valid_participants.append(member)
-
-        if not valid_participants:
-            result = "❌ Aucun participant valide."
-        else:
-            winners = random.sample(valid_participants, min(giveaway["winners"], len(valid_participants)))
-            winner_mentions = " ".join([w.mention for w in winners])
-            result = f"🎉 **Félicitations** : {winner_mentions} !"
-
-        embed = discord.Embed(
-            title="🎁 **GIVEAWAY TERMINÉ**",
-            description=f"**{giveaway['title']}**\n\n{result}",
-            color=0x57F287
-        )
-        embed.set_footer(text="Merci d'avoir participé !")
-        await channel.send(embed=embed)
+        error = await self.finish(str(ctx.guild.id), giveaway_id)
+        if error:
+            return await ctx.respond(error, ephemeral=True)
         await ctx.respond("✅ Giveaway terminé.", ephemeral=True)
 
     @giveaway.command(name="reroll", description="Relancer un tirage")
     @commands.has_permissions(manage_guild=True)
     async def reroll(self, ctx, giveaway_id: str):
-        giveaways = load_json("data/giveaways.json", {})
         guild_id = str(ctx.guild.id)
+        giveaway = self.giveaways.get(guild_id, giveaway_id)
 
-        if guild_id not in giveaways or giveaway_id not in giveaways[guild_id]:
+        if giveaway is None:
             return await ctx.respond("❌ Giveaway introuvable.", ephemeral=True)
 
-        giveaway = giveaways[guild_id][giveaway_id]
         if not giveaway["ended"]:
             return await ctx.respond("❌ Le giveaway n'est pas terminé.", ephemeral=True)
 
@@ -182,16 +382,10 @@ class GiveawaySystem(commands.Cog):
         if not channel:
             return await ctx.respond("❌ Salon introuvable.", ephemeral=True)
 
-        valid_participants = []
-        for uid in giveaway["participants"]:
-            member = channel.guild.get_member(int(uid))
-            if member:
-                valid_participants.append(member)
-
-        if not valid_participants:
+        winners = await self.draw(channel.guild, guild_id, giveaway_id, giveaway["winners"])
+        if not winners:
             return await ctx.respond("❌ Aucun participant valide.", ephemeral=True)
 
-        winners = random.sample(valid_participants, min(giveaway["winners"], len(valid_participants)))
         winner_mentions = " ".join([w.mention for w in winners])
 
         embed = discord.Embed(
@@ -199,20 +393,19 @@ class GiveawaySystem(commands.Cog):
             description=f"**{giveaway['title']}**\n\n🎉 **Nouveaux gagnants** : {winner_mentions} !",
             color=0xFEE75C
         )
-        await channel.send(embed=embed)
+        await self.rest.send(COMMUNITY, channel, embed=embed)
         await ctx.respond("✅ Tirage relancé.", ephemeral=True)
 
     @giveaway.command(name="list", description="Liste des giveaways actifs")
     @commands.has_permissions(manage_guild=True)
     async def list_giveaways(self, ctx):
-        giveaways = load_json("data/giveaways.json", {})
-        guild_id = str(ctx.guild.id)
+        giveaways = self.giveaways.list(str(ctx.guild.id))
 
-        if guild_id not in giveaways or not giveaways[guild_id]:
+        if not giveaways:
             return await ctx.respond("📭 Aucun giveaway actif.", ephemeral=True)
 
         lines = []
-        for gwid, gw in giveaways[guild_id].items():
+        for gwid, gw in giveaways.items():
             status = "✅ Terminé" if gw["ended"] else "⏳ Actif"
             lines.append(f"- **{gw['title']}** ({status}) — Fin : <t:{gw['end_time']}:R>")
 
@@ -1,27 +1,94 @@
 # cogs/logs.py
 import discord
 from discord.ext import commands
-import json
-import os
+from utils.storage import get_store
+from utils.rest import get_rest, LOGS
+from utils.message_cache import MessageCache
+from utils.timeseries import get_recorder
+from utils.metrics import timed
+from collections import deque
 from datetime import datetime
+import asyncio
 
-def load_json(path, default):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            return json.loads(content) if content else default
-    return default
+# Intents requis par ce cog (profil lean, voir utils/profile.py)
+INTENTS = ("guilds", "guild_messages", "message_content")
 
-def save_json(path, data):
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+# Limites Discord : 10 embeds et 6000 caractères au total par message.
+MAX_EMBEDS = 10
+MAX_CHARS = 6000
+
+class LogBatcher:
+    """File bornée par salon de logs ; les embeds partent par paquets de 10."""
+
+    def __init__(self, interval=2.0, max_queue=500):
+        self.rest = get_rest()
+        self.interval = interval
+        self.max_queue = max_queue
+        self.queues = {}
+        self.events = {}
+        self.tasks = {}
+        self.sent_messages = 0
+        self.sent_embeds = 0
+        self.dropped = 0
+
+    def push(self, channel, embed):
+        queue = self.queues.setdefault(channel.id, deque())
+        if len(queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        queue.append(embed)
+        event = self.events.setdefault(channel.id, asyncio.Event())
+        task = self.tasks.get(channel.id)
+        if task is None or task.done():
+            self.tasks[channel.id] = asyncio.create_task(self._drain(channel, queue, event))
+        elif len(queue) >= MAX_EMBEDS:
+            event.set()
+
+    def _take_batch(self, queue):
+        batch, size = [], 0
+        while queue and len(batch) < MAX_EMBEDS:
+            length = len(queue[0])
+            if batch and size + length > MAX_CHARS:
+                break
+            batch.append(queue.popleft())
+            size += length
+        return batch
+
+    async def _drain(self, channel, queue, event):
+        while queue:
+            if len(queue) < MAX_EMBEDS:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            event.clear()
+            batch = self._take_batch(queue)
+            try:
+                await self.rest.send(LOGS, channel, embeds=batch)
+                self.sent_messages += 1
+                self.sent_embeds += len(batch)
+            except Exception:
+                self.dropped += len(batch)
+
+    def pending(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def stop(self):
+        for task in self.tasks.values():
+            task.cancel()
 
 class LogsSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config_path = "data/logs_config.json"
-        self.config = load_json(self.config_path, {})
+        self.store = get_store(self.config_path, {})
+        self.config = self.store.data
+        self.batcher = LogBatcher()
+        self.message_cache = MessageCache()
+        self.recorder = get_recorder()
+
+    def cog_unload(self):
+        self.batcher.stop()
 
     def get_log_channel(self, guild_id, log_type):
         guild_data = self.config.get(str(guild_id), {})
@@ -31,10 +98,7 @@ class LogsSystem(commands.Cog):
     async def send_log(self, guild_id, log_type, embed):
         channel = self.get_log_channel(guild_id, log_type)
         if channel:
-            try:
-                await channel.send(embed=embed)
-            except:
-                pass
+            self.batcher.push(channel, embed)
 
     logs = discord.SlashCommandGroup("logs", "Configurer les salons de logs")
 
@@ -45,7 +109,7 @@ class LogsSystem(commands.Cog):
         if gid not in self.config:
             self.config[gid] = {}
         self.config[gid]["message"] = str(salon.id)
-        save_json(self.config_path, self.config)
+        self.store.save()
         await ctx.respond(f"✅ Logs messages → {salon.mention}", ephemeral=False)
 
     @logs.command(name="modération")
@@ -55,7 +119,7 @@ class LogsSystem(commands.Cog):
         if gid not in self.config:
             self.config[gid] = {}
         self.config[gid]["moderation"] = str(salon.id)
-        save_json(self.config_path, self.config)
+        self.store.save()
         await ctx.respond(f"✅ Logs modération → {salon.mention}", ephemeral=False)
 
     @logs.command(name="ticket")
@@ -65,13 +129,32 @@ class LogsSystem(commands.Cog):
         if gid not in self.config:
             self.config[gid] = {}
         self.config[gid]["ticket"] = str(salon.id)
-        save_json(self.config_path, self.config)
+        self.store.save()
         await ctx.respond(f"✅ Logs tickets → {salon.mention}", ephemeral=False)
 
+    @logs.command(name="stats", description="État de la file d'envoi des logs")
+    @commands.has_permissions(administrator=True)
+    async def stats(self, ctx):
+        b = self.batcher
+        c = self.message_cache
+        await ctx.respond(
+            f"📨 Messages envoyés : `{b.sent_messages}` ({b.sent_embeds} logs)\n"
+            f"⏳ En attente : `{b.pending()}`\n"
+            f"🗑️ Perdus : `{b.dropped}`\n"
+            f"🧠 Cache messages : `{len(c)}` entrées, `{c.memory() / 1024:.0f}` Ko, "
+            f"taux de succès `{c.hit_rate():.0%}`",
+            ephemeral=True
+        )
+
     @commands.Cog.listener()
+    @timed("listener_seconds", listener="logs.on_message")
     async def on_message(self, message):
         if message.author.bot or not message.guild:
             return
+        self.message_cache.put(message.guild.id, message.id, message.author.id, message.channel.id,
+                               message.content, len(message.attachments))
+        self.recorder.record(message.guild.id, "messages")
+        self.recorder.record(message.guild.id, f"ch:{message.channel.id}")
         embed = discord.Embed(
             title="",
             description=(
@@ -90,10 +173,7 @@ class LogsSystem(commands.Cog):
         embed.set_footer(text=f"ID: {message.id}")
         await self.send_log(message.guild.id, "message", embed)
 
-    @commands.Cog.listener()
-    async def on_message_edit(self, before, after):
-        if before.author.bot or not before.guild or before.content == after.content:
-            return
+    def edit_embed(self, before_content, after_content, author, message_id):
         embed = discord.Embed(
             title="",
             description=(
@@ -106,15 +186,12 @@ class LogsSystem(commands.Cog):
             color=0x2b2d31,
             timestamp=datetime.utcnow()
         )
-        embed.add_field(name="Avant", value=f"```{before.content[:250]}```", inline=False)
-        embed.add_field(name="Après", value=f"```{after.content[:250]}```", inline=False)
-        embed.set_footer(text=f"Auteur: {before.author} • ID: {before.id}")
-        await self.send_log(before.guild.id, "message", embed)
+        embed.add_field(name="Avant", value=f"```{before_content[:250]}```" if before_content else "*(Inconnu)*", inline=False)
+        embed.add_field(name="Après", value=f"```{after_content[:250]}```", inline=False)
+        embed.set_footer(text=f"Auteur: {author} • ID: {message_id}")
+        return embed
 
-    @commands.Cog.listener()
-    async def on_message_delete(self, message):
-        if message.author.bot or not message.guild:
-            return
+    def delete_embed(self, author_mention, channel_mention, content, message_id):
         embed = discord.Embed(
             title="",
             description=(
@@ -127,12 +204,62 @@ class LogsSystem(commands.Cog):
             color=0x2b2d31,
             timestamp=datetime.utcnow()
         )
-        embed.add_field(name="👤 Auteur", value=message.author.mention, inline=True)
-        embed.add_field(name="# Salon", value=message.channel.mention, inline=True)
-        embed.add_field(name="💬 Contenu", value=f"```{message.content[:500]}```", inline=False)
-        embed.set_footer(text=f"ID: {message.id}")
+        embed.add_field(name="👤 Auteur", value=author_mention, inline=True)
+        embed.add_field(name="# Salon", value=channel_mention, inline=True)
+        embed.add_field(name="💬 Contenu", value=f"```{content[:500]}```" if content else "*(Inconnu)*", inline=False)
+        embed.set_footer(text=f"ID: {message_id}")
+        return embed
+
+    @commands.Cog.listener()
+    async def on_message_edit(self, before, after):
+        if before.author.bot or not before.guild or before.content == after.content:
+            return
+        self.message_cache.put(before.guild.id, after.id, after.author.id, after.channel.id, after.content, len(after.attachments))
+        embed = self.edit_embed(before.content, after.content, before.author, before.id)
+        await self.send_log(before.guild.id, "message", embed)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        # Message encore dans le cache de la lib : on_message_edit s'en occupe.
+        if payload.cached_message is not None or not payload.guild_id:
+            return
+        content = payload.data.get("content")
+        author = payload.data.get("author", {})
+        if content is None or author.get("bot"):
+            return
+        cached = self.message_cache.get(payload.guild_id, payload.message_id)
+        if cached is not None and cached.content == content[:self.message_cache.content_limit]:
+            return
+        self.message_cache.put(payload.guild_id, payload.message_id, int(author.get("id", 0)), payload.channel_id, content,
+                               len(payload.data.get("attachments", [])))
+        embed = self.edit_embed(cached.content if cached else None, content, f"<@{author.get('id')}>", payload.message_id)
+        await self.send_log(payload.guild_id, "message", embed)
+
+    @commands.Cog.listener()
+    async def on_message_delete(self, message):
+        if message.author.bot or not message.guild:
+            return
+        self.message_cache.pop(message.guild.id, message.id)
+        embed = self.delete_embed(message.author.mention, message.channel.mention, message.content, message.id)
         await self.send_log(message.guild.id, "message", embed)
 
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        if payload.cached_message is not None or not payload.guild_id:
+            return
+        cached = self.message_cache.get(payload.guild_id, payload.message_id)
+        # Seuls les messages humains sont mis en cache : un miss peut être un bot.
+        if cached is None:
+            return
+        self.message_cache.pop(payload.guild_id, payload.message_id)
+        embed = self.delete_embed(f"<@{cached.author_id}>", f"<#{cached.channel_id}>", cached.content, payload.message_id)
+        await self.send_log(payload.guild_id, "message", embed)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.message_cache.drop_guild(guild.id)
+        self.recorder.drop_guild(guild.id)
+
     @commands.Cog.listener()
     async def on_guild_channel_create(self, channel):
         if not hasattr(channel, 'guild'):
@@ -0,0 +1,119 @@
+# cogs/metrics.py
+import discord
+from discord.ext import commands
+from utils.metrics import histogram, histograms, counters, gauge, render
+from utils.rest import get_rest
+from utils.cluster import CLUSTER
+import asyncio
+import os
+import time
+
+# Intents requis par ce cog (profil lean, voir utils/profile.py)
+INTENTS = ("guilds",)
+
+# Endpoint Prometheus local : SEIKO_METRICS_PORT=0 le désactive ; le cluster n écoute sur port + n.
+METRICS_HOST = os.getenv("SEIKO_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("SEIKO_METRICS_PORT", "9464"))
+READ_TIMEOUT = 5
+TOP = 8
+
+class Metrics(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.rest = get_rest()
+        self.server = None
+        # ✅ Durée de chaque commande slash, du début de l'exécution à la fin (erreurs comprises)
+        bot.before_invoke(self.before_command)
+        bot.after_invoke(self.after_command)
+        gauge("gateway_latency_seconds", self.gateway_latency)
+        gauge("rest_queue_depth", lambda: [({"priority": name}, n) for name, n in self.rest.depth().items()])
+        gauge("rest_inflight", self.rest.inflight)
+        gauge("guilds", lambda: len(self.bot.guilds))
+
+    def cog_unload(self):
+        if self.server is not None:
+            self.server.close()
+
+    async def before_command(self, ctx):
+        ctx.metrics_started = time.perf_counter()
+
+    async def after_command(self, ctx):
+        started = getattr(ctx, "metrics_started", None)
+        if started is not None:
+            histogram("command_seconds", command=ctx.command.qualified_name).observe(time.perf_counter() - started)
+
+    def gateway_latency(self):
+        shards = getattr(self.bot, "shards", None)
+        if not shards:
+            return self.bot.latency
+        return [({"shard": str(sid)}, info.latency) for sid, info in sorted(shards.items())]
+
+    # === ENDPOINT HTTP ===
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if self.server is not None or not METRICS_PORT:
+            return
+        port = METRICS_PORT + int(CLUSTER or 0)
+        try:
+            self.server = await asyncio.start_server(self.handle, METRICS_HOST, port)
+        except OSError as e:
+            print(f"❌ Endpoint métriques {METRICS_HOST}:{port} : {e}")
+            return
+        print(f"📈 Métriques sur http://{METRICS_HOST}:{port}/metrics")
+
+    async def handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+            while (await asyncio.wait_for(reader.readline(), READ_TIMEOUT)).strip():
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, ctype, body = "200 OK", "text/plain; version=0.0.4; charset=utf-8", render().encode("utf-8")
+            else:
+                status, ctype, body = "404 Not Found", "text/plain; charset=utf-8", b"Not Found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    # === COMMANDE SLASH ===
+    def section(self, name, label):
+        found = [h for h in histograms().values() if h.name == name and h.count]
+        found.sort(key=lambda h: h.count, reverse=True)
+        return [f"- `{h.labels[label]}` : {h.summary()}" for h in found[:TOP]]
+
+    def rest_lines(self):
+        limited = {c.labels["route"]: c.value for c in counters().values() if c.name == "rest_ratelimited"}
+        calls = [h for h in histograms().values() if h.name == "rest_request_seconds" and h.count]
+        calls.sort(key=lambda h: h.count, reverse=True)
+        lines = []
+        for h in calls[:TOP]:
+            route = h.labels["route"]
+            lines.append(f"- `{route}` : {h.count} appels, p95 ≤ {h.quantile(0.95)}s, 429 : {limited.pop(route, 0)}")
+        lines += [f"- `{route}` : 429 : {n}" for route, n in sorted(limited.items(), key=lambda i: -i[1])[:TOP]]
+        return lines
+
+    @discord.slash_command(name="bot_metrics", description="Voir les métriques du bot")
+    @commands.has_permissions(administrator=True)
+    async def cmd_bot_metrics(self, ctx):
+        sections = [
+            ("⌨️ Commandes", self.section("command_seconds", "command")),
+            ("👂 Événements", self.section("listener_seconds", "listener")),
+            ("🖱️ Composants", self.section("component_seconds", "component")),
+            ("📮 REST", self.rest_lines()),
+            ("💾 Écritures", self.section("storage_flush_seconds", "file")),
+        ]
+        text = f"📈 **Métriques** • gateway `{round(self.bot.latency * 1000)} ms`"
+        for title, lines in sections:
+            text += f"\n**{title}**\n" + ("\n".join(lines) if lines else "- aucune mesure")
+        if self.server is not None:
+            text += f"\n🔗 Prometheus : `{METRICS_HOST}:{METRICS_PORT + int(CLUSTER or 0)}/metrics`"
+        await ctx.respond(text[:2000], ephemeral=True)
+
+def setup(bot):
+    bot.add_cog(Metrics(bot))
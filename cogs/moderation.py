@@ -1,29 +1,48 @@
 # cogs/moderation.py
 import discord
 from discord.ext import commands
-import json
-import os
-from datetime import datetime, timedelta
+from utils.storage import get_store
+from utils.database import get_database
+from utils.scheduler import DeadlineScheduler
+from utils.rest import get_rest, MODERATION
+from utils.cluster import owns
+from datetime import datetime, timedelta, timezone
 import re
+import time
 
-def load_json(path, default):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return default
+# Unban automatique refusé par Discord : nouvel essai après 1 min, 2 min, ... jusqu'à 6 h.
+UNBAN_RETRY = 60
+UNBAN_RETRY_MAX = 6 * 3600
 
-def save_json(path, data):
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+# Intents requis par ce cog (profil lean, voir utils/profile.py)
+INTENTS = ("guilds",)
 
 class Moderation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.data_path = "data/moderation.json"
         self.config_path = "data/moderation_config.json"
-        self.data = load_json(self.data_path, {"bans": {}, "mutes": {}, "warns": {}})
-        self.config = load_json(self.config_path, {})
+        self.store = get_store(self.data_path, {"bans": {}, "mutes": {}, "warns": {}})
+        self.data = self.store.data
+        self.config = get_store(self.config_path, {}).data
+        self.db = get_database()
+        self.rest = get_rest()
+        self.migrate_legacy_bans()
+
+        # ✅ Bans temporaires : une file d'échéances (serveur, membre) -> expires_at
+        self.ban_expiry = DeadlineScheduler(self.expire_ban)
+        self.unban_attempts = {}
+        for guild_id, user_id, expires_at in self.pending_bans():
+            if owns(bot, guild_id):
+                self.ban_expiry.schedule((guild_id, user_id), expires_at)
+
+    def cog_unload(self):
+        self.ban_expiry.stop()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Rattrape les bans expirés pendant l'arrêt.
+        self.ban_expiry.ensure_started()
 
     def parse_time(self, time_str):
         total = 0
@@ -32,6 +51,62 @@ class Moderation(commands.Cog):
             total += amount * {'d': 86400, 'h': 3600, 'm': 60, 's': 1}[unit]
         return total
 
+    # === PERSISTANCE (JSON ou SQLite) ===
+    def migrate_legacy_bans(self):
+        # Les anciens bans étaient rangés par membre seulement : serveur inconnu.
+        bans = self.data["bans"]
+        legacy = [uid for uid, entry in bans.items() if "moderator" in entry]
+        if legacy:
+            unknown = bans.setdefault("", {})
+            for uid in legacy:
+                unknown[uid] = bans.pop(uid)
+            self.store.save()
+
+    def record_ban(self, guild_id, user_id, ban):
+        if self.db:
+            return self.db.set_ban(guild_id, user_id, ban)
+        self.data["bans"].setdefault(guild_id, {})[user_id] = ban
+        self.store.save()
+
+    def remove_ban(self, guild_id, user_id):
+        if self.db:
+            return self.db.remove_ban(guild_id, user_id)
+        guild_bans = self.data["bans"].get(guild_id, {})
+        if guild_bans.pop(user_id, None) is not None:
+            if not guild_bans:
+                del self.data["bans"][guild_id]
+            self.store.save()
+
+    def pending_bans(self):
+        if self.db:
+            return self.db.pending_bans()
+        return [(gid, uid, ban["expires_at"])
+                for gid, guild_bans in self.data["bans"].items()
+                for uid, ban in guild_bans.items() if ban.get("expires_at")]
+
+    def record_mute(self, guild_id, user_id, mute):
+        if self.db:
+            return self.db.set_mute(guild_id, user_id, mute)
+        self.data["mutes"][user_id] = mute
+        self.store.save()
+
+    def remove_mute(self, guild_id, user_id):
+        if self.db:
+            return self.db.remove_mute(guild_id, user_id)
+        self.data["mutes"].pop(user_id, None)
+        self.store.save()
+
+    def add_warn(self, guild_id, user_id, warn):
+        if self.db:
+            return self.db.add_warn(guild_id, user_id, warn)
+        self.data["warns"].setdefault(guild_id, {}).setdefault(user_id, []).append(warn)
+        self.store.save()
+
+    def get_warns(self, guild_id, user_id, limit=10):
+        if self.db:
+            return self.db.get_warns(guild_id, user_id, limit)
+        return self.data["warns"].get(guild_id, {}).get(user_id, [])[:limit]
+
     def get_log_channel(self, guild_id):
         cid = self.config.get(str(guild_id), {}).get("log_channel")
         return self.bot.get_channel(int(cid)) if cid else None
@@ -52,19 +127,27 @@ class Moderation(commands.Cog):
             return await ctx.respond("❌ La raison doit faire au moins 5 caractères.", ephemeral=True)
 
         seconds = self.parse_time(temps)
-        await membre.ban(reason=raison)
+        await self.rest.call(MODERATION, f"guilds/{ctx.guild.id}/bans", membre.ban, reason=raison)
 
-        # ✅ Sauvegarde
-        self.data["bans"][str(membre.id)] = {
+        # ✅ Sauvegarde (durée nulle = ban définitif)
+        now = datetime.now(timezone.utc)
+        expires_at = int(now.timestamp()) + seconds if seconds > 0 else None
+        key = (str(ctx.guild.id), str(membre.id))
+        self.record_ban(*key, {
             "moderator": str(ctx.author.id),
             "reason": raison,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        save_json(self.data_path, self.data)
+            "timestamp": now.isoformat(),
+            "expires_at": expires_at
+        })
+        if expires_at:
+            self.ban_expiry.schedule(key, expires_at)
+        else:
+            self.ban_expiry.cancel(key)
 
         # ✅ Notification en MP
         try:
-            await membre.send(
+            await self.rest.dm(
+                MODERATION, membre,
                 f"⚠️ Vous avez été **banni** du serveur **{ctx.guild.name}**.\n"
                 f"**Raison** : {raison}\n"
                 f"**Durée** : {temps}\n\n"
@@ -76,7 +159,8 @@ class Moderation(commands.Cog):
         # ✅ Log dans le salon dédié
         log_ch = self.get_log_channel(ctx.guild.id)
         if log_ch:
-            await log_ch.send(
+            await self.rest.send(
+                MODERATION, log_ch,
                 f"🔨 **Ban** | {membre} ({membre.id})\n"
                 f"📝 Raison : {raison}\n"
                 f"👤 Modérateur : {ctx.author}"
@@ -89,19 +173,50 @@ class Moderation(commands.Cog):
     async def unban(self, ctx, user_id: str):
         try:
             user = await self.bot.fetch_user(int(user_id))
-            await ctx.guild.unban(user)
-            self.data["bans"].pop(user_id, None)
-            save_json(self.data_path, self.data)
+            await self.rest.call(MODERATION, f"guilds/{ctx.guild.id}/bans", ctx.guild.unban, user)
+            self.remove_ban(str(ctx.guild.id), user_id)
+            self.ban_expiry.cancel((str(ctx.guild.id), user_id))
             await ctx.respond(f"✅ {user} débanni.")
 
             # ✅ Log
             log_ch = self.get_log_channel(ctx.guild.id)
             if log_ch:
-                await log_ch.send(f"🔓 **Unban** | {user} ({user.id})\n👤 Modérateur : {ctx.author}")
+                await self.rest.send(MODERATION, log_ch, f"🔓 **Unban** | {user} ({user.id})\n👤 Modérateur : {ctx.author}")
 
         except Exception as e:
             await ctx.respond("❌ Utilisateur non trouvé.")
 
+    async def expire_ban(self, key):
+        guild_id, user_id = key
+        guild = self.bot.get_guild(int(guild_id))
+        if not guild:
+            self.remove_ban(guild_id, user_id)
+            return
+        try:
+            await self.rest.call(
+                MODERATION, f"guilds/{guild.id}/bans", guild.unban,
+                discord.Object(id=int(user_id)), reason="Ban temporaire expiré"
+            )
+        except discord.NotFound:
+            # Déjà débanni à la main
+            self.unban_attempts.pop(key, None)
+            self.remove_ban(guild_id, user_id)
+            return
+        except discord.HTTPException as e:
+            # ✅ L'échéance reste enregistrée : nouvel essai plus tard, délai doublé à chaque échec
+            attempts = self.unban_attempts[key] = self.unban_attempts.get(key, 0) + 1
+            delay = min(UNBAN_RETRY * 2 ** (attempts - 1), UNBAN_RETRY_MAX)
+            print(f"❌ Unban {user_id} sur {guild_id} : {e} (nouvel essai dans {delay}s)")
+            self.ban_expiry.schedule(key, time.time() + delay)
+            return
+        self.unban_attempts.pop(key, None)
+        self.remove_ban(guild_id, user_id)
+
+        # ✅ Log
+        log_ch = self.get_log_channel(guild.id)
+        if log_ch:
+            await self.rest.send(MODERATION, log_ch, f"⏱️ **Unban automatique** | <@{user_id}> ({user_id})\n📝 Ban temporaire expiré")
+
     @commands.slash_command(name="mute", description="Muter un membre")
     @commands.has_permissions(manage_roles=True)
     async def mute(self, ctx, membre: discord.Member, temps: str, raison: str):
@@ -118,18 +233,21 @@ class Moderation(commands.Cog):
             return await ctx.respond("❌ La raison doit faire au moins 5 caractères.", ephemeral=True)
 
         seconds = self.parse_time(temps)
-        await membre.timeout(datetime.utcnow() + timedelta(seconds=seconds), reason=raison)
+        await self.rest.call(
+            MODERATION, f"guilds/{ctx.guild.id}/members", membre.timeout,
+            datetime.utcnow() + timedelta(seconds=seconds), reason=raison
+        )
 
         # ✅ Sauvegarde
-        self.data["mutes"][str(membre.id)] = {
+        self.record_mute(str(ctx.guild.id), str(membre.id), {
             "moderator": str(ctx.author.id),
             "reason": raison
-        }
-        save_json(self.data_path, self.data)
+        })
 
         # ✅ Notification en MP
         try:
-            await membre.send(
+            await self.rest.dm(
+                MODERATION, membre,
                 f"🔇 Vous avez été **muté** du serveur **{ctx.guild.name}**.\n"
                 f"**Raison** : {raison}\n"
                 f"**Durée** : {temps}\n\n"
@@ -141,7 +259,8 @@ class Moderation(commands.Cog):
         # ✅ Log
         log_ch = self.get_log_channel(ctx.guild.id)
         if log_ch:
-            await log_ch.send(
+            await self.rest.send(
+                MODERATION, log_ch,
                 f"🔇 **Mute** | {membre} ({membre.id})\n"
                 f"⏱️ Durée : {temps}\n"
                 f"📝 Raison : {raison}\n"
@@ -157,20 +276,19 @@ class Moderation(commands.Cog):
         if membre == ctx.author:
             return await ctx.respond("❌ Vous ne pouvez pas vous démuter vous-même.", ephemeral=True)
 
-        await membre.timeout(None)
-        self.data["mutes"].pop(str(membre.id), None)
-        save_json(self.data_path, self.data)
+        await self.rest.call(MODERATION, f"guilds/{ctx.guild.id}/members", membre.timeout, None)
+        self.remove_mute(str(ctx.guild.id), str(membre.id))
 
         # ✅ Notification en MP
         try:
-            await membre.send(f"🔊 Vous avez été **démuté** du serveur **{ctx.guild.name}**.")
+            await self.rest.dm(MODERATION, membre, f"🔊 Vous avez été **démuté** du serveur **{ctx.guild.name}**.")
         except:
             pass
 
         # ✅ Log
         log_ch = self.get_log_channel(ctx.guild.id)
         if log_ch:
-            await log_ch.send(f"🔊 **Unmute** | {membre} ({membre.id})\n👤 Modérateur : {ctx.author}")
+            await self.rest.send(MODERATION, log_ch, f"🔊 **Unmute** | {membre} ({membre.id})\n👤 Modérateur : {ctx.author}")
 
         await ctx.respond(f"✅ {membre.mention} démuté.")
 
@@ -189,24 +307,16 @@ class Moderation(commands.Cog):
         if len(raison.strip()) < 5:
             return await ctx.respond("❌ La raison doit faire au moins 5 caractères.", ephemeral=True)
 
-        gid = str(ctx.guild.id)
-        uid = str(membre.id)
-
-        if gid not in self.data["warns"]:
-            self.data["warns"][gid] = {}
-        if uid not in self.data["warns"][gid]:
-            self.data["warns"][gid][uid] = []
-
-        self.data["warns"][gid][uid].append({
+        self.add_warn(str(ctx.guild.id), str(membre.id), {
             "moderator": str(ctx.author.id),
             "reason": raison,
             "timestamp": datetime.utcnow().isoformat()
         })
-        save_json(self.data_path, self.data)
 
         # ✅ Notification en MP
         try:
-            await membre.send(
+            await self.rest.dm(
+                MODERATION, membre,
                 f"⚠️ Vous avez été **averti** sur le serveur **{ctx.guild.name}**.\n"
                 f"**Raison** : {raison}\n\n"
                 "Plusieurs avertissements peuvent mener à un ban ou un mute."
@@ -217,7 +327,8 @@ class Moderation(commands.Cog):
         # ✅ Log
         log_ch = self.get_log_channel(ctx.guild.id)
         if log_ch:
-            await log_ch.send(
+            await self.rest.send(
+                MODERATION, log_ch,
                 f"⚠️ **Warn** | {membre} ({membre.id})\n"
                 f"📝 Raison : {raison}\n"
                 f"👤 Modérateur : {ctx.author}"
@@ -240,11 +351,12 @@ class Moderation(commands.Cog):
         if len(raison.strip()) < 5:
             return await ctx.respond("❌ La raison doit faire au moins 5 caractères.", ephemeral=True)
 
-        await membre.kick(reason=raison)
+        await self.rest.call(MODERATION, f"guilds/{ctx.guild.id}/members", membre.kick, reason=raison)
 
         # ✅ Notification en MP
         try:
-            await membre.send(
+            await self.rest.dm(
+                MODERATION, membre,
                 f"🚪 Vous avez été **expulsé** du serveur **{ctx.guild.name}**.\n"
                 f"**Raison** : {raison}\n\n"
                 "Vous pouvez demander à être réinvité si vous le souhaitez."
@@ -255,7 +367,8 @@ class Moderation(commands.Cog):
         # ✅ Log
         log_ch = self.get_log_channel(ctx.guild.id)
         if log_ch:
-            await log_ch.send(
+            await self.rest.send(
+                MODERATION, log_ch,
                 f"🚪 **Kick** | {membre} ({membre.id})\n"
                 f"📝 Raison : {raison}\n"
                 f"👤 Modérateur : {ctx.author}"
@@ -266,9 +379,7 @@ class Moderation(commands.Cog):
     @commands.slash_command(name="modlog", description="Voir l'historique de modération d'un membre")
     @commands.has_permissions(manage_guild=True)
     async def modlog(self, ctx, membre: discord.Member):
-        gid = str(ctx.guild.id)
-        uid = str(membre.id)
-        warns = self.data["warns"].get(gid, {}).get(uid, [])
+        warns = self.get_warns(str(ctx.guild.id), str(membre.id))
         if not warns:
             return await ctx.respond(f"📋 Aucun avertissement pour {membre}.", ephemeral=True)
 
@@ -276,7 +387,7 @@ class Moderation(commands.Cog):
             f"⚠️ **{w['reason']}** — <t:{int(datetime.fromisoformat(w['timestamp']).timestamp())}:R>"
             for w in warns
         ]
-        await ctx.respond("\n".join(log_lines[:10]), ephemeral=True)
+        await ctx.respond("\n".join(log_lines), ephemeral=True)
 
 def setup(bot):
     bot.add_cog(Moderation(bot))
\ No newline at end of file
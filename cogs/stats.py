@@ -1,25 +1,132 @@
-# cogs/stats.py
 import discord
 from discord.ext import commands
 from datetime import datetime
+from utils.timeseries import get_recorder, sparkline, PERIODS
+from utils.profile import chunk_members
+import time
+
+# Intents requis par ce cog (profil lean, voir utils/profile.py)
+INTENTS = ("guilds", "members")
+
+# Démarrage du processus (chargement des cogs), pour l'uptime réel.
+STARTED_AT = time.monotonic()
+
+def format_uptime(seconds):
+    days, rest = divmod(int(seconds), 86400)
+    hours, rest = divmod(rest, 3600)
+    minutes = rest // 60
+    return f"{days}j {hours}h {minutes}m" if days else f"{hours}h {minutes}m"
 
 class Stats(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # ✅ Compteurs humains / bots par serveur, tenus à jour par les événements
+        self.counts = {}
+        self.ready_count = 0
+        self.resumes = 0
+        self.recorder = get_recorder()
+
+    def seed(self, guild):
+        # Un seul parcours, une fois la liste des membres reçue
+        if not guild.chunked:
+            return
+        self.set_counts(guild, guild.members)
+
+    def set_counts(self, guild, members):
+        bots = sum(1 for m in members if m.bot)
+        counts = self.counts[guild.id] = [len(members) - bots, bots]
+        return counts
+
+    async def ensure_counts(self, ctx):
+        """Profil lean : pas de chunking au démarrage, un seul chunk (hors cache) au premier /stats."""
+        counts = self.counts.get(ctx.guild.id)
+        if counts is None and self.bot.intents.members:
+            await ctx.defer()
+            counts = self.set_counts(ctx.guild, await chunk_members(ctx.guild))
+        return counts
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.ready_count += 1
+        if self.ready_count > 1:
+            # Reconnexion : les serveurs revenus passent par on_guild_available
+            return
+        for guild in self.bot.guilds:
+            self.seed(guild)
+
+    @commands.Cog.listener()
+    async def on_resumed(self):
+        self.resumes += 1
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        self.seed(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild):
+        self.seed(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.counts.pop(guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        counts = self.counts.get(member.guild.id)
+        if counts is not None:
+            counts[member.bot] += 1
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.recorder.record(member.guild.id, "leaves")
+        counts = self.counts.get(member.guild.id)
+        if counts is not None:
+            counts[member.bot] -= 1
+
+    @commands.Cog.listener()
+    async def on_application_command(self, ctx):
+        if ctx.guild:
+            self.recorder.record(ctx.guild.id, "commands")
+
+    def history(self, guild, period):
+        tier = PERIODS[period]
+        rows = [("Messages", "messages"), ("Arrivées", "joins"), ("Départs", "leaves"),
+                ("Vocal", "voice"), ("Commandes", "commands")]
+        lines = []
+        for label, name in rows:
+            series = self.recorder.series.get((guild.id, name))
+            if series is None:
+                continue
+            values = list(series.values(tier))
+            if series.kind == "max":
+                lines.append(f"[TREND {period}] {label:<10} {sparkline(values, agg=max)}  pic {max(values)}")
+            else:
+                lines.append(f"[TREND {period}] {label:<10} {sparkline(values)}  {sum(values)}")
+        channels = sorted(self.recorder.channels(guild.id), key=lambda c: c[1].total(tier), reverse=True)[:3]
+        for channel_id, series in channels:
+            channel = guild.get_channel(channel_id)
+            name = f"#{channel.name}"[:10] if channel else f"#{channel_id}"[:10]
+            values = list(series.values(tier))
+            lines.append(f"[TREND {period}] {name:<10} {sparkline(values)}  {sum(values)}")
+        return lines or [f"[TREND {period}] Aucune donnée pour l'instant."]
+
+    def reconnects(self):
+        return max(self.ready_count - 1, 0) + self.resumes
 
     @discord.slash_command(name="stats", description="📊 Statistiques — Console Seïko")
-    async def stats(self, ctx):
+    async def stats(self, ctx, historique: discord.Option(str, choices=list(PERIODS), required=False, default=None)):
         guild = ctx.guild
         if not guild:
             return await ctx.respond("❌ Commande utilisable uniquement dans un serveur.", ephemeral=False)
 
         total_members = guild.member_count
-        humans = sum(1 for m in guild.members if not m.bot)
-        bots = total_members - humans
+        counts = await self.ensure_counts(ctx)
+        humans, bots = counts if counts else ("…", "…")
         channels = len(guild.channels)
         roles = len(guild.roles)
         ping = round(self.bot.latency * 1000)
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        uptime = format_uptime(time.monotonic() - STARTED_AT)
 
         content = (
             f"[SERVER]    SYSTÈME DE SURVEILLANCE — SEÏKO                              {now}\n"
@@ -29,10 +136,12 @@ class Stats(commands.Cog):
             f"[SERVER] Salons : {channels}\n"
             f"[SERVER] Rôles : {roles}\n"
             f"[SERVER] Latence : {ping} ms\n"
-            f"[SERVER] Uptime : En ligne"
+            f"[SERVER] Uptime : {uptime} (reconnexions : {self.reconnects()})"
         )
+        if historique:
+            content += "\n" + "\n".join(self.history(guild, historique))
 
         await ctx.respond(content, ephemeral=False)
 
 def setup(bot):
-    bot.add_cog(Stats(bot))
\ No newline at end of file
+    bot.add_cog(Stats(bot))
@@ -1,100 +1,322 @@
 # cogs/tickets.py
 import discord
-from discord.ext import commands, tasks
-import json
-import os
+from discord.ext import commands
 from datetime import datetime, timedelta, timezone
 import asyncio
+import bisect
+import time
+from utils.storage import get_store
+from utils.database import get_database
+from utils.rest import get_rest, INTERACTION, TICKETS
+from utils.scheduler import DeadlineScheduler
+from utils.metrics import histogram, timed
+from utils import components, transcript
+from utils.cluster import owns
+from collections import defaultdict
+import os
 
-def load_data():
-    os.makedirs("data", exist_ok=True)
-    path = "data/tickets_seiko_v10.json"
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {"config": {}, "tickets": {}}
-
-def save_data(data):
-    with open("data/tickets_seiko_v10.json", "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+# Intents requis par ce cog (profil lean, voir utils/profile.py)
+INTENTS = ("guilds", "guild_messages", "message_content")
+
+TICKETS_PATH = "data/tickets_seiko_v10.json"
+DELETE_AFTER = timedelta(hours=24)
+# Numéros réservés d'un coup en SQLite (quelques trous possibles après un redémarrage).
+NUMBER_BLOCK = 10
+
+# custom_id des composants de ticket : fixes, donc valables après un redémarrage.
+OPEN_ID = "ticket:open"
+CLAIM_ID = "ticket:claim"
+CLOSE_ID = "ticket:close"
+
+def ticket_buttons():
+    return (
+        components.RoutedButton(label="👤 Take charge", style=discord.ButtonStyle.primary, custom_id=CLAIM_ID),
+        components.RoutedButton(label="🔒 Close", style=discord.ButtonStyle.danger, custom_id=CLOSE_ID),
+    )
+
+class TicketStore:
+    """Config des tickets en JSON ; tickets eux-mêmes en JSON ou dans SQLite.
+
+    Index secondaires tenus en mémoire et mis à jour à chaque changement
+    d'état : tickets ouverts par (serveur, membre), par (serveur, état) et
+    tickets fermés triés par date de fermeture.
+    """
+
+    def __init__(self):
+        self.store = get_store(TICKETS_PATH, {"config": {}, "tickets": {}})
+        self.data = self.store.data
+        self.db = get_database()
+        self.indexed = {}
+        self.open_channels = set()
+        self.by_user = defaultdict(set)
+        self.by_state = defaultdict(set)
+        self.by_closed = []
+        # Places réservées par les créations en cours (salon pas encore créé)
+        self.pending = defaultdict(int)
+        tickets = self.db.all_tickets() if self.db else self.data["tickets"].items()
+        for ch_id, ticket in tickets:
+            self._index(ch_id, ticket)
+        self.blocks = {}
+
+    def _index(self, channel_id, ticket):
+        entry = (ticket.get("guild_id"), ticket.get("user_id"), ticket["state"], ticket.get("closed_at"), ticket.get("number"))
+        self.indexed[channel_id] = entry
+        guild_id, user_id, state, closed_at, _ = entry
+        self.by_state[(guild_id, state)].add(channel_id)
+        if state == "OPEN":
+            # Consulté à chaque message : doit rester O(1).
+            self.open_channels.add(channel_id)
+            self.by_user[(guild_id, user_id)].add(channel_id)
+        elif closed_at:
+            bisect.insort(self.by_closed, (closed_at, channel_id))
+
+    def _unindex(self, channel_id):
+        entry = self.indexed.pop(channel_id, None)
+        if entry is None:
+            return
+        guild_id, user_id, state, closed_at, _ = entry
+        self._discard(self.by_state, (guild_id, state), channel_id)
+        if state == "OPEN":
+            self.open_channels.discard(channel_id)
+            self._discard(self.by_user, (guild_id, user_id), channel_id)
+        elif closed_at:
+            i = bisect.bisect_left(self.by_closed, (closed_at, channel_id))
+            if i < len(self.by_closed) and self.by_closed[i] == (closed_at, channel_id):
+                del self.by_closed[i]
+
+    @staticmethod
+    def _discard(index, key, channel_id):
+        channels = index.get(key)
+        if channels is not None:
+            channels.discard(channel_id)
+            if not channels:
+                del index[key]
+
+    def save(self):
+        self.store.save()
+
+    def next_number(self, guild_id):
+        """Numéro de ticket unique et croissant pour ce serveur.
+
+        Aucun `await` entre la lecture et l'incrément : deux interactions
+        simultanées ne peuvent pas obtenir le même numéro. Seul le plus haut
+        numéro attribué est persisté.
+        """
+        config = self.data["config"].setdefault(guild_id, {})
+        if not self.db:
+            number = config.get("ticket_counter", 1)
+            config["ticket_counter"] = number + 1
+            self.store.save()
+            return number
+        block = self.blocks.get(guild_id)
+        if block is None or block[0] >= block[1]:
+            first = self.db.reserve_ticket_numbers(guild_id, NUMBER_BLOCK, start=config.get("ticket_counter", 1))
+            block = self.blocks[guild_id] = [first, first + NUMBER_BLOCK]
+        number = block[0]
+        block[0] += 1
+        return number
+
+    def add(self, channel_id, ticket):
+        self._unindex(channel_id)
+        self._index(channel_id, ticket)
+        if self.db:
+            return self.db.upsert_ticket(channel_id, ticket)
+        self.data["tickets"][channel_id] = ticket
+        self.store.save()
+
+    def get(self, channel_id):
+        if self.db:
+            return self.db.get_ticket(channel_id)
+        return self.data["tickets"].get(channel_id)
+
+    def update(self, channel_id, **fields):
+        ticket = self.get(channel_id)
+        if ticket is None:
+            return None
+        ticket.update(fields)
+        self.add(channel_id, ticket)
+        return ticket
+
+    def remove(self, channel_id):
+        self._unindex(channel_id)
+        if self.db:
+            return self.db.remove_ticket(channel_id)
+        self.data["tickets"].pop(channel_id, None)
+        self.store.save()
+
+    def open_tickets(self, guild_id):
+        return self.by_state.get((guild_id, "OPEN"), set())
+
+    def user_tickets(self, guild_id, user_id):
+        return self.by_user.get((guild_id, user_id), set())
+
+    def number(self, channel_id):
+        entry = self.indexed.get(channel_id)
+        return entry[4] if entry else None
+
+    def closed_tickets(self):
+        return [(ch_id, closed_at) for closed_at, ch_id in self.by_closed]
+
+    def open_limit_reached(self, guild_id, user_id):
+        limit = self.data["config"].get(guild_id, {}).get("max_open_per_user", 0)
+        used = len(self.user_tickets(guild_id, user_id)) + self.pending.get((guild_id, user_id), 0)
+        return bool(limit) and used >= limit
+
+    def reserve(self, guild_id, user_id):
+        """Contrôle la limite et réserve une place sans `await` entre les deux."""
+        if self.open_limit_reached(guild_id, user_id):
+            return False
+        self.pending[(guild_id, user_id)] += 1
+        return True
+
+    def release(self, guild_id, user_id):
+        key = (guild_id, user_id)
+        self.pending[key] -= 1
+        if self.pending[key] <= 0:
+            del self.pending[key]
+
+_tickets = None
+
+def get_tickets():
+    global _tickets
+    if _tickets is None:
+        _tickets = TicketStore()
+    return _tickets
 
 class TicketHandler(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.data = load_data()
-        self.cleanup_old_tickets.start()
+        self.tickets = get_tickets()
+        self.rest = get_rest()
+        self.live = transcript.get_live_transcripts()
+        # ✅ Suppression 24h après fermeture : un seul timer pour tous les tickets fermés
+        self.deletions = DeadlineScheduler(self.delete_ticket)
+        for ch_id, closed_at in self.tickets.closed_tickets():
+            if owns(bot, self.tickets.indexed[ch_id][0]):
+                self.schedule_deletion(ch_id, datetime.fromisoformat(closed_at))
 
     def cog_unload(self):
-        self.cleanup_old_tickets.cancel()
-
-    @tasks.loop(hours=1)
-    async def cleanup_old_tickets(self):
-        now = datetime.now(timezone.utc)
-        to_delete = []
-        for ch_id, ticket in self.data["tickets"].items():
-            if ticket["state"] == "CLOSED":
-                close_time = datetime.fromisoformat(ticket["closed_at"])
-                if (now - close_time) > timedelta(hours=24):
-                    to_delete.append(ch_id)
-        for ch_id in to_delete:
+        self.deletions.stop()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.deletions.ensure_started()
+
+    def schedule_deletion(self, channel_id, closed_at):
+        self.deletions.schedule(channel_id, (closed_at + DELETE_AFTER).timestamp())
+
+    async def delete_ticket(self, channel_id):
+        channel = self.bot.get_channel(int(channel_id))
+        if channel:
             try:
-                channel = self.bot.get_channel(int(ch_id))
-                if channel:
-                    await channel.delete(reason="[Seïko] Car cleaning 24h")
-                self.data["tickets"].pop(ch_id, None)
-                save_data(self.data)
-            except:
+                await self.rest.call(TICKETS, f"channels/{channel.id}", channel.delete, reason="[Seïko] Car cleaning 24h")
+            except discord.NotFound:
                 pass
+            except discord.HTTPException:
+                # On réessaie plus tard ; le ticket reste fermé en base.
+                self.deletions.schedule(channel_id, (datetime.now(timezone.utc) + timedelta(hours=1)).timestamp())
+                return
+        self.tickets.remove(channel_id)
+
+    @commands.Cog.listener()
+    @timed("listener_seconds", listener="tickets.on_message")
+    async def on_message(self, message):
+        # ✅ Transcript capturé pendant la vie du ticket
+        ch_id = str(message.channel.id)
+        if ch_id in self.tickets.open_channels and transcript.is_transcribed(message):
+            self.live.append(ch_id, message)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        ch_id = str(channel.id)
+        await self.live.discard(ch_id)
+        if ch_id in self.deletions or ch_id in self.tickets.open_channels:
+            self.deletions.cancel(ch_id)
+            self.tickets.remove(ch_id)
 
 class TicketSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-
-    @discord.slash_command(name="ticket", description="Open a ticket via the menu")
-    async def ticket(self, ctx):
-        data = load_data()
-        guild_id = str(ctx.guild.id)
-        if guild_id not in data["config"]:
-            data["config"][guild_id] = {
-                "categories": [
-                    {"name": "Help", "description": "Need help ?", "emoji": "❓"},
-                    {"name": "Bug", "description": "Report a bug", "emoji": "⚠️"},
-                    {"name": "Autre", "description": "Toute autre demande", "emoji": "📝"}
-                ],
-                "ping_role": None,
-                "transcript_channel": None,
-                "footer": "By Seïko",
-                "ticket_counter": 1
-            }
-            save_data(data)
-
-        config = data["config"][guild_id]
-
-        # ✅ Vérifie que "categories" existe
-        if "categories" not in config or not config["categories"]:
-            config["categories"] = [
-                {"name": "Help", "description": "Need help ?", "emoji": "❓"},
-                {"name": "Bug", "description": "Report a bug", "emoji": "⚠️"},
-                {"name": "Autre", "description": "Toute autre demande", "emoji": "📝"}
-            ]
-            save_data(data)
-
-        options = []
-        for cat in config["categories"]:
-            options.append(
-                discord.SelectOption(
-                    label=cat["name"],
-                    description=cat["description"],
-                    emoji=cat["emoji"]
-                )
-            )
-
-        select = discord.ui.Select(
-            placeholder="Select a category",
-            options=options
-        )
-
-        async def select_callback(interaction):
+        self.tickets = get_tickets()
+        self.rest = get_rest()
+        self.live = transcript.get_live_transcripts()
+        self.time_to_channel = histogram("ticket_time_to_channel")
+        self.time_to_ready = histogram("ticket_time_to_ready")
+        # ✅ Menu et boutons persistants : routés par custom_id, même après un redémarrage
+        router = components.get_router()
+        router.register(OPEN_ID, self.open_ticket)
+        router.register(CLAIM_ID, self.claim_ticket)
+        router.register(CLOSE_ID, self.close_ticket)
+        router.attach(bot)
+        self.views_added = False
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Les vues se construisent avec une boucle active : pas dans __init__ (load_extension)
+        if self.views_added:
+            return
+        self.views_added = True
+        components.get_router().add_view(self.bot, components.persistent_view(
+            components.RoutedSelect(custom_id=OPEN_ID, options=[discord.SelectOption(label="…")]),
+            *ticket_buttons()
+        ))
+
+    async def play_progress(self, channel):
+        # Animation purement décorative : jamais sur le chemin critique de la création
+        route = f"channels/{channel.id}/messages"
+        try:
+            progress = await self.rest.send(TICKETS, channel, "```\n[░░░░░░░░░░] 0% — Initialization...\n```")
+            for i in range(2, 11, 2):
+                await asyncio.sleep(0.4)
+                bars = "█" * i + "░" * (10 - i)
+                await self.rest.call(TICKETS, route, progress.edit, content=f"```\n[{bars}] {i * 10}% — Creation...\n```")
+            await asyncio.sleep(1)
+            await self.rest.call(TICKETS, route, progress.delete)
+        except discord.HTTPException:
+            pass
+
+    async def send_transcript(self, channel, ticket_number, config):
+        ch = self.bot.get_channel(int(config["transcript_channel"])) if config.get("transcript_channel") else None
+        archive = config.get("transcript_archive", False)
+        ch_id = str(channel.id)
+        if not ch and not archive:
+            return await self.live.discard(ch_id)
+
+        path = transcript.archive_path(channel.guild.id, ticket_number) if archive else transcript.temp_path(ticket_number)
+        header = f"Transcript — Ticket {ticket_number} — #{channel.name}"
+        if self.live.has(ch_id):
+            # ✅ Déjà capturé pendant la vie du ticket : on compresse, sans appel à l'historique
+            lines = await self.live.finalize(ch_id, path, header)
+        else:
+            # Capture absente depuis la création : on relit l'historique page par page
+            writer = transcript.TranscriptWriter(path, header=header)
+            try:
+                await transcript.stream_history(channel, writer)
+            finally:
+                await writer.close()
+            lines = writer.lines
+
+        try:
+            if ch and lines:
+                file = transcript.as_file(path, ticket_number, ch.guild.filesize_limit)
+                if file:
+                    await self.rest.send(TICKETS, ch, f"📄 **Transcript — Ticket {ticket_number}** ({lines} messages)", file=file)
+                else:
+                    await self.rest.send(TICKETS, ch, f"📄 **Transcript — Ticket {ticket_number}** : trop volumineux, archivé sur le bot.")
+        finally:
+            if not archive:
+                os.remove(path)
+
+    async def open_ticket(self, interaction):
+        started = time.perf_counter()
+        guild_id = str(interaction.guild.id)
+        config = self.tickets.data["config"].get(guild_id, {})
+        # ✅ Limite de tickets ouverts par membre : place réservée jusqu'à la création du salon
+        user_id = str(interaction.user.id)
+        if not self.tickets.reserve(guild_id, user_id):
+            await interaction.response.send_message("❌ You already have too many open tickets.", ephemeral=True)
+            return
+        try:
             await interaction.response.defer(ephemeral=False)
 
             category = interaction.data['values'][0]
@@ -108,48 +330,37 @@ class TicketSystem(commands.Cog):
             }
 
             ping_line = ""
-            if config["ping_role"]:
+            if config.get("ping_role"):
                 role = guild.get_role(config["ping_role"])
                 if role:
                     overwrites[role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
                     ping_line = f"<@&{role.id}>"
 
-            # ✅ Vérifie et initialise ticket_counter
-            if "ticket_counter" not in config:
-                config["ticket_counter"] = 1
-                save_data(data)
+            ticket_number = self.tickets.next_number(guild_id)
 
-            ticket_number = config["ticket_counter"]
-            config["ticket_counter"] = ticket_number + 1
-            save_data(data)
-
-            channel = await guild.create_text_channel(
+            channel = await self.rest.call(
+                TICKETS, f"guilds/{guild.id}/channels", guild.create_text_channel,
                 name=f"{ticket_number}-{category}",
                 overwrites=overwrites,
                 reason=f"Ticket #{ticket_number} par {user.name}"
             )
+        finally:
+            # Pas d'await jusqu'à tickets.add : la place passe directement au vrai ticket
+            self.tickets.release(guild_id, user_id)
+        self.live.start(str(channel.id))
+        self.time_to_channel.observe(time.perf_counter() - started)
+
+        # ✅ Compteur et ticket persistés en une seule écriture
+        self.tickets.add(str(channel.id), {
+            "guild_id": str(guild.id),
+            "user_id": str(user.id),
+            "number": ticket_number,
+            "category": category,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "state": "OPEN"
+        })
 
-            # ✅ BARRE 2S
-            progress = await channel.send("```\n[░░░░░░░░░░] 0% — Initialization...\n```")
-            for i in range(1, 11):
-                await asyncio.sleep(0.2)
-                bars = "█" * i + "░" * (10 - i)
-                pct = i * 10
-                await progress.edit(content=f"```\n[{bars}] {pct}% — Creation...\n```")
-            await progress.edit(content="```\n[██████████] 100% — Ticket initialized !\n```")
-            await asyncio.sleep(1)
-            await progress.delete()
-
-            ticket_id = str(channel.id)
-            data["tickets"][ticket_id] = {
-                "user_id": str(user.id),
-                "category": category,
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "state": "OPEN"
-            }
-            save_data(data)
-
-            message_lines = [
+        message_lines = [
             "🟦 **TICKET — Seïko**",
             ping_line,
             "───────────────────────────────────────",
@@ -177,77 +388,111 @@ class TicketSystem(commands.Cog):
             "Please detail your request.",
             "A staff member will respond within 24-48 hours."
         ]
-            await channel.send(content="\n".join(message_lines))
-
-            async def claim_callback(i):
-                if not i.user.guild_permissions.manage_channels:
-                    await i.response.send_message("❌ Staff only.", ephemeral=True)
-                    return
-                await i.channel.send(f"🔷 **{i.user.mention} took charge of this ticket.**")
-                await i.response.defer()
-
-            async def close_callback(i):
-                if not i.user.guild_permissions.manage_channels:
-                    await i.response.send_message("❌ Staff only.", ephemeral=True)
-                    return
-                await i.response.defer()
-                await i.channel.edit(name=f"closed-{i.channel.name}")
-                await i.channel.send("🔒 Deletion in 24h.")
-
-                if config["transcript_channel"]:
-                    ch = self.bot.get_channel(int(config["transcript_channel"]))
-                    if ch:
-                        msgs = []
-                        async for m in i.channel.history(limit=1000, oldest_first=True):
-                            if m.type == discord.MessageType.default and not m.author.bot:
-                                msgs.append(f"[{m.created_at.strftime('%H:%M')}] {m.author}: {m.content}")
-                        if msgs:
-                            await ch.send(f"📄 **Transcript — Ticket {ticket_number}**\n```txt\n" + "\n".join(msgs[:100]) + "\n```")
-
-                # ✅ BARRE 24H
-                prog = await i.channel.send("```\n[░░░░░░░░░░] 0% — Deletion...\n```")
-                steps = 96
-                for s in range(1, steps + 1):
-                    await asyncio.sleep(900)
-                    pct = int((s / steps) * 100)
-                    filled = "█" * min(s, 10)
-                    empty = "░" * max(0, 10 - s)
-                    try:
-                        await prog.edit(content=f"```\n[{filled}{empty}] {pct}% — Deletion...\n```")
-                    except:
-                        break
-                try:
-                    await i.channel.delete()
-                except:
-                    pass
-
-            view = discord.ui.View(timeout=None)
-            view.add_item(discord.ui.Button(label="👤 Take charge", style=discord.ButtonStyle.primary))
-            view.add_item(discord.ui.Button(label="🔒 Close", style=discord.ButtonStyle.danger))
-
-            for item in view.children:
-                if item.label == "👤 Take charge":
-                    item.callback = claim_callback
-                else:
-                    item.callback = close_callback
 
-            await channel.send(view=view)
-            await interaction.followup.send(f"✅ Ticket **#{ticket_number}** created : {channel.mention}", ephemeral=True)
+        view = components.persistent_view(*ticket_buttons())
 
-        select.callback = select_callback
+        if config.get("progress_bar"):
+            asyncio.create_task(self.play_progress(channel))
+
+        # ✅ Message d'accueil + boutons en un seul envoi, en parallèle du suivi
+        async def post_welcome():
+            await self.rest.send(TICKETS, channel, content="\n".join(message_lines), view=view)
+            self.time_to_ready.observe(time.perf_counter() - started)
+
+        await asyncio.gather(
+            post_welcome(),
+            self.rest.call(
+                INTERACTION, f"webhooks/{interaction.id}", interaction.followup.send,
+                f"✅ Ticket **#{ticket_number}** created : {channel.mention}", ephemeral=True
+            )
+        )
+
+    async def claim_ticket(self, i):
+        if not i.user.guild_permissions.manage_channels:
+            await i.response.send_message("❌ Staff only.", ephemeral=True)
+            return
+        await self.rest.send(TICKETS, i.channel, f"🔷 **{i.user.mention} took charge of this ticket.**")
+        await i.response.defer()
+
+    async def close_ticket(self, i):
+        if not i.user.guild_permissions.manage_channels:
+            await i.response.send_message("❌ Staff only.", ephemeral=True)
+            return
+        ch_id = str(i.channel.id)
+        ticket = self.tickets.get(ch_id)
+        if ticket and ticket["state"] == "CLOSED":
+            await i.response.send_message("🔒 Already closed.", ephemeral=True)
+            return
+
+        # ✅ Fermeture persistée avant tout await : un second clic voit déjà CLOSED
+        closed_at = datetime.now(timezone.utc)
+        self.tickets.update(ch_id, state="CLOSED", closed_at=closed_at.isoformat())
+        self.bot.get_cog("TicketHandler").schedule_deletion(ch_id, closed_at)
+        await i.response.defer()
+
+        await self.rest.call(TICKETS, f"channels/{i.channel.id}", i.channel.edit, name=f"closed-{i.channel.name}")
+        await self.rest.send(TICKETS, i.channel, f"🔒 Deletion <t:{int((closed_at + DELETE_AFTER).timestamp())}:R>.")
+
+        ticket_number = ticket["number"] if ticket else i.channel.name.split("-", 1)[0]
+        config = self.tickets.data["config"].get(str(i.guild.id), {})
+        await self.send_transcript(i.channel, ticket_number, config)
+
+    @discord.slash_command(name="ticket", description="Open a ticket via the menu")
+    async def ticket(self, ctx):
+        data = self.tickets.data
+        guild_id = str(ctx.guild.id)
+        if guild_id not in data["config"]:
+            data["config"][guild_id] = {
+                "categories": [
+                    {"name": "Help", "description": "Need help ?", "emoji": "❓"},
+                    {"name": "Bug", "description": "Report a bug", "emoji": "⚠️"},
+                    {"name": "Autre", "description": "Toute autre demande", "emoji": "📝"}
+                ],
+                "ping_role": None,
+                "transcript_channel": None,
+                "footer": "By Seïko",
+                "ticket_counter": 1
+            }
+            self.tickets.save()
+
+        config = data["config"][guild_id]
+
+        # ✅ Vérifie que "categories" existe
+        if "categories" not in config or not config["categories"]:
+            config["categories"] = [
+                {"name": "Help", "description": "Need help ?", "emoji": "❓"},
+                {"name": "Bug", "description": "Report a bug", "emoji": "⚠️"},
+                {"name": "Autre", "description": "Toute autre demande", "emoji": "📝"}
+            ]
+            self.tickets.save()
+
+        options = []
+        for cat in config["categories"]:
+            options.append(
+                discord.SelectOption(
+                    label=cat["name"],
+                    description=cat["description"],
+                    emoji=cat["emoji"]
+                )
+            )
+
+        select = components.RoutedSelect(
+            custom_id=OPEN_ID,
+            placeholder="Select a category",
+            options=options
+        )
         embed = discord.Embed(
             title="🎫 **Support Center**",
             description="Select a category below.",
             color=0x2b2d31
         )
         embed.set_footer(text="By Seïko")
-        view = discord.ui.View(timeout=None)
-        view.add_item(select)
+        view = components.persistent_view(select)
         await ctx.respond(embed=embed, view=view, ephemeral=False)
 
     @discord.slash_command(name="ticket_create", description="Create a ticket in a lounge")
     async def ticket_create(self, ctx, salon: discord.TextChannel, category: discord.Option(str, choices=["Help", "Bug", "Autre"])):
-        data = load_data()
+        data = self.tickets.data
         guild_id = str(ctx.guild.id)
         if guild_id not in data["config"]:
             data["config"][guild_id] = {
@@ -256,15 +501,10 @@ class TicketSystem(commands.Cog):
                 "ticket_counter": 1
             }
         config = data["config"][guild_id]
-
-        # ✅ Vérifie ticket_counter
-        if "ticket_counter" not in config:
-            config["ticket_counter"] = 1
-            save_data(data)
-
-        ticket_number = config["ticket_counter"]
-        config["ticket_counter"] = ticket_number + 1
-        save_data(data)
+        user_id = str(ctx.author.id)
+        if not self.tickets.reserve(guild_id, user_id):
+            return await ctx.respond("❌ You already have too many open tickets.", ephemeral=True)
+        ticket_number = self.tickets.next_number(guild_id)
 
         overwrites = {
             ctx.guild.default_role: discord.PermissionOverwrite(read_messages=False),
@@ -279,20 +519,25 @@ class TicketSystem(commands.Cog):
                 overwrites[role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
                 ping_line = f"<@&{role.id}>"
 
-        channel = await ctx.guild.create_text_channel(
-            name=f"{ticket_number}-{category}",
-            overwrites=overwrites,
-            category=salon.category
-        )
+        try:
+            channel = await self.rest.call(
+                TICKETS, f"guilds/{ctx.guild.id}/channels", ctx.guild.create_text_channel,
+                name=f"{ticket_number}-{category}",
+                overwrites=overwrites,
+                category=salon.category
+            )
+        finally:
+            self.tickets.release(guild_id, user_id)
+        self.live.start(str(channel.id))
 
-        ticket_id = str(channel.id)
-        data["tickets"][ticket_id] = {
+        self.tickets.add(str(channel.id), {
+            "guild_id": str(ctx.guild.id),
             "user_id": str(ctx.author.id),
+            "number": ticket_number,
             "category": category,
             "created_at": datetime.now(timezone.utc).isoformat(),
             "state": "OPEN"
-        }
-        save_data(data)
+        })
 
         message_lines = [
             "🟦 **TICKET — Seïko**",
@@ -300,7 +545,7 @@ class TicketSystem(commands.Cog):
             "───────────────────────────────────────",
             "**FR**",
             f"📁 Catégorie : **{category}**",
-            f"👤 Utilisateur : **{user.name}**",
+            f"👤 Utilisateur : **{ctx.author.name}**",
             f"🔢 Ticket N° : **{ticket_number}**",
             f"🕒 Heure : **{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}**",
             "───────────────────────────────────────",
@@ -313,7 +558,7 @@ class TicketSystem(commands.Cog):
             "",
             "**EN**",
             f"📁 Category : **{category}**",
-            f"👤 User : **{user.name}**",
+            f"👤 User : **{ctx.author.name}**",
             f"🔢 Ticket N° : **{ticket_number}**",
             f"🕒 Time : **{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}**",
             "───────────────────────────────────────",
@@ -322,24 +567,86 @@ class TicketSystem(commands.Cog):
             "Please detail your request.",
             "A staff member will respond within 24-48 hours."
         ]
-        await channel.send(content="\n".join(message_lines))
+        await self.rest.send(TICKETS, channel, content="\n".join(message_lines))
         await ctx.respond(f"✅ Ticket **#{ticket_number}** : {channel.mention}", ephemeral=False)
 
     @discord.slash_command(name="ticket_transcript", description="Transcript room")
     @commands.has_permissions(administrator=True)
-    async def ticket_transcript(self, ctx, salon: discord.TextChannel):
-        data = load_data()
+    async def ticket_transcript(self, ctx, salon: discord.TextChannel, archive: bool = False):
+        data = self.tickets.data
         guild_id = str(ctx.guild.id)
         if guild_id not in data["config"]:
             data["config"][guild_id] = {}
         data["config"][guild_id]["transcript_channel"] = str(salon.id)
-        save_data(data)
-        await ctx.respond(f"✅ Transcripts in {salon.mention}.", ephemeral=False)
+        data["config"][guild_id]["transcript_archive"] = archive
+        self.tickets.save()
+        suffix = " (archived on disk)" if archive else ""
+        await ctx.respond(f"✅ Transcripts in {salon.mention}{suffix}.", ephemeral=False)
+
+    @discord.slash_command(name="ticket_progress", description="Show an animated progress bar when a ticket opens")
+    @commands.has_permissions(administrator=True)
+    async def ticket_progress(self, ctx, enabled: bool):
+        data = self.tickets.data
+        guild_id = str(ctx.guild.id)
+        if guild_id not in data["config"]:
+            data["config"][guild_id] = {}
+        data["config"][guild_id]["progress_bar"] = enabled
+        self.tickets.save()
+        await ctx.respond(f"✅ Progress bar {'enabled' if enabled else 'disabled'}.", ephemeral=False)
+
+    @discord.slash_command(name="ticket_latency", description="Ticket creation latency")
+    @commands.has_permissions(administrator=True)
+    async def ticket_latency(self, ctx):
+        await ctx.respond(
+            f"📁 Salon créé : {self.time_to_channel.summary()}\n"
+            f"✅ Ticket prêt : {self.time_to_ready.summary()}",
+            ephemeral=True
+        )
+
+    @discord.slash_command(name="ticket_limit", description="Max open tickets per member (0 = unlimited)")
+    @commands.has_permissions(administrator=True)
+    async def ticket_limit(self, ctx, maximum: int):
+        data = self.tickets.data
+        guild_id = str(ctx.guild.id)
+        if guild_id not in data["config"]:
+            data["config"][guild_id] = {}
+        data["config"][guild_id]["max_open_per_user"] = max(maximum, 0)
+        self.tickets.save()
+        await ctx.respond(f"✅ Limit : `{maximum if maximum > 0 else '∞'}` open ticket(s) per member.", ephemeral=False)
+
+    @discord.slash_command(name="ticket_list", description="Open tickets of the server or of a member")
+    @commands.has_permissions(manage_channels=True)
+    async def ticket_list(self, ctx, membre: discord.Member = None):
+        guild_id = str(ctx.guild.id)
+        if membre:
+            channels = self.tickets.user_tickets(guild_id, str(membre.id))
+            title = f"🎫 Tickets ouverts — {membre.display_name}"
+        else:
+            channels = self.tickets.open_tickets(guild_id)
+            title = "🎫 Tickets ouverts"
+        closed = len(self.tickets.by_state.get((guild_id, "CLOSED"), ()))
+        lines = [f"`#{self.tickets.number(ch_id)}` <#{ch_id}>" for ch_id in sorted(channels, key=lambda c: self.tickets.number(c) or 0)[:25]]
+        if len(channels) > 25:
+            lines.append(f"… +{len(channels) - 25}")
+        embed = discord.Embed(title=title, description="\n".join(lines) or "Aucun ticket.", color=0x2b2d31)
+        embed.set_footer(text=f"{len(channels)} ouvert(s) • {closed} fermé(s) en attente de suppression")
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    @discord.slash_command(name="ticket_transcript_get", description="Get an archived transcript")
+    @commands.has_permissions(administrator=True)
+    async def ticket_transcript_get(self, ctx, numero: int):
+        path = transcript.archive_path(ctx.guild.id, numero)
+        if not os.path.exists(path):
+            return await ctx.respond(f"❌ No archived transcript for ticket `{numero}`.", ephemeral=True)
+        file = transcript.as_file(path, numero, ctx.guild.filesize_limit)
+        if not file:
+            return await ctx.respond("❌ Transcript too large to upload.", ephemeral=True)
+        await ctx.respond(f"📄 Transcript — Ticket {numero}", file=file, ephemeral=True)
 
     @discord.slash_command(name="ticket_category_add", description="Add a category")
     @commands.has_permissions(administrator=True)
     async def ticket_category_add(self, ctx, nom: str, description: str, emoji: str):
-        data = load_data()
+        data = self.tickets.data
         guild_id = str(ctx.guild.id)
         if guild_id not in data["config"]:
             data["config"][guild_id] = {
@@ -352,13 +659,13 @@ class TicketSystem(commands.Cog):
             config["categories"] = []
         config["categories"].append({"name": nom, "description": description, "emoji": emoji})
         data["config"][guild_id] = config
-        save_data(data)
+        self.tickets.save()
         await ctx.respond(f"✅ Category `{nom}` added.", ephemeral=False)
 
     @discord.slash_command(name="ticket_category_del", description="Delete a category")
     @commands.has_permissions(administrator=True)
     async def ticket_category_del(self, ctx, nom: str):
-        data = load_data()
+        data = self.tickets.data
         guild_id = str(ctx.guild.id)
         if guild_id not in data["config"]:
             return await ctx.respond("❌ NO config.", ephemeral=False)
@@ -370,18 +677,18 @@ class TicketSystem(commands.Cog):
         if len(config["categories"]) == before:
             return await ctx.respond(f"❌ Category `{nom}` not found.", ephemeral=False)
         data["config"][guild_id] = config
-        save_data(data)
+        self.tickets.save()
         await ctx.respond(f"✅ Category `{nom}` deleted.", ephemeral=False)
 
     @discord.slash_command(name="ticket_ping", description="Define the staff role")
     @commands.has_permissions(administrator=True)
     async def ticket_ping(self, ctx, role: discord.Role):
-        data = load_data()
+        data = self.tickets.data
         guild_id = str(ctx.guild.id)
         if guild_id not in data["config"]:
             data["config"][guild_id] = {}
         data["config"][guild_id]["ping_role"] = role.id
-        save_data(data)
+        self.tickets.save()
         await ctx.respond(f"✅ Ping role : {role.mention}", ephemeral=False)
 
 def setup(bot):
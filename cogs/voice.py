@@ -1,25 +1,184 @@
 # cogs/voice.py
 import discord
-from discord.ext import commands
-import json
-import os
-
-def load_config():
-    os.makedirs("data", exist_ok=True)
-    path = "data/voice_config.json"
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {"channels": {}}
-
-def save_config(data):
-    with open("data/voice_config.json", "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+from discord.ext import commands, tasks
+from utils.storage import get_store
+from utils.rest import get_rest, VOICE, BACKGROUND
+from utils.metrics import counter, histogram, timed
+from utils.timeseries import get_recorder
+from utils.cluster import owns
+from collections import defaultdict, deque
+import asyncio
+import heapq
+import time
+
+# Intents requis par ce cog (profil lean, voir utils/profile.py)
+INTENTS = ("guilds", "voice_states")
+
+# Réserve : au plus MAX_POOL vocs par hub, une création toutes les REFILL_INTERVAL secondes.
+MAX_POOL = 25
+REFILL_INTERVAL = 2.0
+
+class TempRegistry:
+    """Vocs temporaires indexées par ID, persistées avec la config.
+
+    Par hub : le prochain numéro jamais utilisé et un min-tas des numéros
+    libérés en dessous, pour toujours rendre le plus petit numéro libre.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.channels = store.data.setdefault("temp", {})
+        self.free = defaultdict(list)
+        self.next = defaultdict(lambda: 1)
+        used = defaultdict(set)
+        for entry in self.channels.values():
+            used[entry["hub"]].add(entry["number"])
+        for hub_id, numbers in used.items():
+            self.next[hub_id] = max(numbers) + 1
+            self.free[hub_id] = [n for n in range(1, max(numbers)) if n not in numbers]
+            heapq.heapify(self.free[hub_id])
+
+    def __contains__(self, channel_id):
+        return channel_id in self.channels
+
+    def allocate(self, hub_id):
+        free = self.free[hub_id]
+        if free:
+            return heapq.heappop(free)
+        number = self.next[hub_id]
+        self.next[hub_id] = number + 1
+        return number
+
+    def give_back(self, hub_id, number):
+        if number == self.next[hub_id] - 1:
+            self.next[hub_id] = number
+        else:
+            heapq.heappush(self.free[hub_id], number)
+
+    def claim(self, channel_id, hub_id, number):
+        """Enregistre une voc existante avec son numéro actuel."""
+        free = self.free[hub_id]
+        if number >= self.next[hub_id]:
+            for n in range(self.next[hub_id], number):
+                heapq.heappush(free, n)
+            self.next[hub_id] = number + 1
+        elif number in free:
+            free.remove(number)
+            heapq.heapify(free)
+        self.add(channel_id, hub_id, number)
+
+    def add(self, channel_id, hub_id, number, pooled=False):
+        self.channels[channel_id] = {"hub": hub_id, "number": number}
+        if pooled:
+            self.channels[channel_id]["pooled"] = True
+        self.store.save()
+
+    def is_pooled(self, channel_id):
+        return self.channels.get(channel_id, {}).get("pooled", False)
+
+    def unpool(self, channel_id):
+        self.channels[channel_id].pop("pooled", None)
+        self.store.save()
+
+    def release(self, channel_id):
+        entry = self.channels.pop(channel_id, None)
+        if entry is not None:
+            self.give_back(entry["hub"], entry["number"])
+            self.store.save()
+        return entry
 
 class VoiceSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.config = load_config()
+        self.store = get_store("data/voice_config.json", {"channels": {}})
+        self.config = self.store.data
+        self.rest = get_rest()
+        self.temp = TempRegistry(self.store)
+        self.recovered = False
+        self.pools = defaultdict(deque)
+        for channel_id, entry in self.temp.channels.items():
+            if entry.get("pooled"):
+                self.pools[entry["hub"]].append(channel_id)
+        self.refills = {}
+        self.pool_hits = counter("voice_pool_hits")
+        self.pool_misses = counter("voice_pool_misses")
+        self.join_to_move = histogram("voice_join_to_move")
+        # Membres en vocal par serveur, relevé chaque minute pour /stats
+        self.recorder = get_recorder()
+        self.in_voice = defaultdict(int)
+
+    def cog_unload(self):
+        self.sample_voice.cancel()
+        for task in self.refills.values():
+            task.cancel()
+
+    @staticmethod
+    def occupancy(guild):
+        # Lue dans les états vocaux : le cache membres peut être partiel (profil lean)
+        return sum(len(vc.voice_states) for vc in guild.voice_channels + guild.stage_channels)
+
+    @tasks.loop(minutes=1)
+    async def sample_voice(self):
+        # ✅ Recalculé à chaque relevé : un événement manqué (reconnexion) ne fait pas dériver le compteur
+        for guild in self.bot.guilds:
+            self.in_voice[guild.id] = self.occupancy(guild)
+            self.recorder.record(guild.id, "voice", self.in_voice[guild.id], kind="max")
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # ✅ Une seule fois : on rattrape les vocs temporaires restées après un arrêt
+        if self.recovered:
+            return
+        self.recovered = True
+        self.sample_voice.start()
+        await self.recover_orphans()
+        for hub_id in self.config["channels"]:
+            if self.owns_hub(hub_id):
+                self.refill(hub_id)
+
+    def owns_hub(self, hub_id):
+        # Mode cluster : les vocs d'un hub sont gérées par le processus de son serveur
+        config = self.config["channels"].get(hub_id)
+        return config is None or owns(self.bot, config["guild_id"])
+
+    async def recover_orphans(self):
+        for channel_id, entry in list(self.temp.channels.items()):
+            if not self.owns_hub(entry["hub"]):
+                continue
+            channel = self.bot.get_channel(int(channel_id))
+            if channel is None:
+                self.forget(channel_id)
+            elif not channel.voice_states and not self.temp.is_pooled(channel_id):
+                await self.delete_temp(channel)
+
+        # Vocs créées avant le registre : reconnues une dernière fois par leur nom
+        for hub_id, config in self.config["channels"].items():
+            if not self.owns_hub(hub_id):
+                continue
+            guild = self.bot.get_guild(int(config["guild_id"]))
+            if guild is None:
+                continue
+            prefix = config["base_name"] + " "
+            for ch in guild.voice_channels:
+                suffix = ch.name[len(prefix):]
+                if str(ch.id) in self.temp or not ch.name.startswith(prefix) or not suffix.isdigit():
+                    continue
+                if ch.voice_states:
+                    self.temp.claim(str(ch.id), hub_id, int(suffix))
+                else:
+                    await self.rest.call(VOICE, f"channels/{ch.id}", ch.delete, reason="Voc temporaire vide")
+
+    def forget(self, channel_id):
+        entry = self.temp.release(channel_id)
+        if entry and entry.get("pooled") and channel_id in self.pools[entry["hub"]]:
+            self.pools[entry["hub"]].remove(channel_id)
+
+    async def delete_temp(self, channel):
+        self.forget(str(channel.id))
+        try:
+            await self.rest.call(VOICE, f"channels/{channel.id}", channel.delete, reason="Voc temporaire vide")
+        except discord.NotFound:
+            pass
 
     @discord.slash_command(name="voc", description="Créer une voc publique avec vocs temporaires staff-only")
     @commands.has_permissions(manage_channels=True)
@@ -41,7 +200,8 @@ class VoiceSystem(commands.Cog):
         base_name = f"𓆩⟡𓆪🔴۰{nom}۰"
 
         # ✅ VOC PRINCIPALE : publique (tout le monde voit + rejoint)
-        channel = await ctx.guild.create_voice_channel(
+        channel = await self.rest.call(
+            VOICE, f"guilds/{ctx.guild.id}/channels", ctx.guild.create_voice_channel,
             name=base_name,
             reason=f"Voc publique par {ctx.author}"
         )
@@ -51,69 +211,145 @@ class VoiceSystem(commands.Cog):
             "guild_id": str(ctx.guild.id),
             "role_ids": [str(r.id) for r in valid_roles]
         }
-        save_config(self.config)
+        self.store.save()
 
         roles_list = ", ".join([r.mention for r in valid_roles])
         await ctx.respond(f"✅ Voc publique créée : `{base_name}`\n**Staff autorisés** : {roles_list}", ephemeral=True)
 
+    def overwrites_for(self, guild, role_ids):
+        # ✅ PERMISSIONS : voc temporaire = staff-only
+        overwrites = {
+            guild.default_role: discord.PermissionOverwrite(
+                view_channel=False,  # ❌ Tout le monde ne voit PAS
+                connect=False
+            )
+        }
+        for rid in role_ids:
+            role = guild.get_role(int(rid))
+            if role:
+                overwrites[role] = discord.PermissionOverwrite(
+                    view_channel=True,  # ✅ Staff voit
+                    connect=True        # ✅ Staff peut rejoindre
+                )
+        return overwrites
+
+    async def create_temp(self, hub, priority, reason, pooled=False):
+        hub_id = str(hub.id)
+        config = self.config["channels"][hub_id]
+        guild = hub.guild
+        # Numéro réservé avant l'appel : deux arrivées simultanées ne se le disputent pas
+        num = self.temp.allocate(hub_id)
+        try:
+            channel = await self.rest.call(
+                priority, f"guilds/{guild.id}/channels", guild.create_voice_channel,
+                name=f"{config['base_name']} {num}",
+                overwrites=self.overwrites_for(guild, config["role_ids"]),
+                category=hub.category,
+                reason=reason
+            )
+        except discord.HTTPException:
+            self.temp.give_back(hub_id, num)
+            raise
+        self.temp.add(str(channel.id), hub_id, num, pooled=pooled)
+        return channel
+
+    def take_pooled(self, hub_id):
+        pool = self.pools.get(hub_id)
+        for _ in range(len(pool or ())):
+            channel_id = pool.popleft()
+            channel = self.bot.get_channel(int(channel_id))
+            if channel is None:
+                self.temp.release(channel_id)
+            elif channel.voice_states:
+                # Un staff s'y trouve déjà : on la garde pour plus tard
+                pool.append(channel_id)
+            else:
+                self.temp.unpool(channel_id)
+                return channel
+        return None
+
+    def refill(self, hub_id):
+        task = self.refills.get(hub_id)
+        if self.config["channels"].get(hub_id, {}).get("pool_size") and (task is None or task.done()):
+            self.refills[hub_id] = asyncio.create_task(self._refill(hub_id))
+
+    async def _refill(self, hub_id):
+        # ✅ Remplissage à débit contrôlé, en priorité la plus basse : les arrivées passent avant
+        while len(self.pools[hub_id]) < self.config["channels"].get(hub_id, {}).get("pool_size", 0):
+            hub = self.bot.get_channel(int(hub_id))
+            if hub is None:
+                return
+            try:
+                channel = await self.create_temp(hub, BACKGROUND, "Voc temporaire (réserve)", pooled=True)
+            except discord.HTTPException:
+                return
+            self.pools[hub_id].append(str(channel.id))
+            await asyncio.sleep(REFILL_INTERVAL)
+
     @commands.Cog.listener()
+    @timed("listener_seconds", listener="voice.on_voice_state_update")
     async def on_voice_state_update(self, member, before, after):
+        if (before.channel is None) != (after.channel is None):
+            self.in_voice[member.guild.id] += 1 if after.channel else -1
+            self.recorder.record(member.guild.id, "voice", self.in_voice[member.guild.id], kind="max")
+
         # ✅ SI REJOINT LA VOC PRINCIPALE (publique)
         if after.channel and str(after.channel.id) in self.config["channels"]:
-            config = self.config["channels"][str(after.channel.id)]
-            base_name = config["base_name"]
+            started = time.perf_counter()
+            hub_id = str(after.channel.id)
             guild = after.channel.guild
-            role_ids = config["role_ids"]
-
-            # Crée la voc temporaire
-            temp_channels = [
-                ch for ch in guild.voice_channels
-                if ch.name.startswith(base_name + " ") and ch.name != base_name
-            ]
-            used_numbers = set()
-            for ch in temp_channels:
-                try:
-                    num = int(ch.name.split()[-1])
-                    used_numbers.add(num)
-                except:
-                    pass
-            num = 1
-            while num in used_numbers:
-                num += 1
-
-            # ✅ PERMISSIONS : voc temporaire = staff-only
-            overwrites = {
-                guild.default_role: discord.PermissionOverwrite(
-                    view_channel=False,  # ❌ Tout le monde ne voit PAS
-                    connect=False
-                )
-            }
-            for rid in role_ids:
-                role = guild.get_role(int(rid))
-                if role:
-                    overwrites[role] = discord.PermissionOverwrite(
-                        view_channel=True,  # ✅ Staff voit
-                        connect=True        # ✅ Staff peut rejoindre
-                    )
-
-            new_channel = await guild.create_voice_channel(
-                name=f"{base_name} {num}",
-                overwrites=overwrites,
-                category=after.channel.category,
-                reason=f"Voc temporaire pour {member}"
-            )
+
+            new_channel = self.take_pooled(hub_id)
+            if new_channel is not None:
+                self.pool_hits.inc()
+            else:
+                if self.config["channels"][hub_id].get("pool_size"):
+                    self.pool_misses.inc()
+                new_channel = await self.create_temp(after.channel, VOICE, f"Voc temporaire pour {member}")
+            self.refill(hub_id)
 
             # Déplace le client
-            await member.edit(voice_channel=new_channel)
+            await self.rest.call(VOICE, f"guilds/{guild.id}/members", member.edit, voice_channel=new_channel)
+            self.join_to_move.observe(time.perf_counter() - started)
+
+        # ✅ Supprime les vocs temporaires vides (jamais celles de la réserve)
+        if (before.channel and str(before.channel.id) in self.temp and not before.channel.voice_states
+                and not self.temp.is_pooled(str(before.channel.id))):
+            await self.delete_temp(before.channel)
 
-        # ✅ Supprime les vocs temporaires vides
-        if before.channel and len(before.channel.members) == 0:
-            for channel_id, config in self.config["channels"].items():
-                base_name = config["base_name"]
-                if (before.channel.name.startswith(base_name + " ") and 
-                    before.channel.name != base_name):
-                    await before.channel.delete(reason="Voc temporaire vide")
-                    break
+    @discord.slash_command(name="voc_pool", description="Réserve de vocs temporaires pré-créées pour une voc publique")
+    @commands.has_permissions(manage_channels=True)
+    async def voc_pool(self, ctx, voc: discord.VoiceChannel, taille: int):
+        hub_id = str(voc.id)
+        if hub_id not in self.config["channels"]:
+            return await ctx.respond("❌ Ce salon n'est pas une voc publique `/voc`.", ephemeral=True)
+        size = max(0, min(taille, MAX_POOL))
+        self.config["channels"][hub_id]["pool_size"] = size
+        self.store.save()
+        # Réserve réduite : les vocs en trop sont supprimées
+        pool = self.pools[hub_id]
+        while len(pool) > size:
+            channel = self.bot.get_channel(int(pool.pop()))
+            if channel is not None:
+                await self.delete_temp(channel)
+        self.refill(hub_id)
+        await ctx.respond(f"✅ Réserve de `{size}` voc(s) pour {voc.mention}.", ephemeral=True)
+
+    @discord.slash_command(name="voc_stats", description="Statistiques des vocs temporaires")
+    @commands.has_permissions(manage_channels=True)
+    async def voc_stats(self, ctx):
+        hits, misses = self.pool_hits.value, self.pool_misses.value
+        rate = hits / (hits + misses) if hits + misses else 0.0
+        await ctx.respond(
+            f"🔊 Vocs temporaires : `{len(self.temp.channels)}` (dont `{sum(len(p) for p in self.pools.values())}` en réserve)\n"
+            f"🎯 Réserve : `{hits}` servies, `{misses}` manquées ({rate:.0%})\n"
+            f"⏱️ Arrivée → déplacement : {self.join_to_move.summary()}",
+            ephemeral=True
+        )
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.forget(str(channel.id))
 
 def setup(bot):
-    bot.add_cog(VoiceSystem(bot))
\ No newline at end of file
+    bot.add_cog(VoiceSystem(bot))
@@ -1,29 +1,27 @@
 # cogs/welcome.py
 import discord
 from discord.ext import commands
-import json
-import os
+from utils.storage import get_store
+from utils.rest import get_rest, COMMUNITY
+from utils.timeseries import get_recorder
+from utils.metrics import timed
 
-def load_json(path, default):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            return json.loads(content) if content else default
-    return default
-
-def save_json(path, data):
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+# Intents requis par ce cog (profil lean, voir utils/profile.py)
+INTENTS = ("guilds", "members")
 
 class WelcomeSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config_path = "data/welcome.json"
-        self.config = load_json(self.config_path, {})
+        self.store = get_store(self.config_path, {})
+        self.config = self.store.data
+        self.rest = get_rest()
+        self.recorder = get_recorder()
 
     @commands.Cog.listener()
+    @timed("listener_seconds", listener="welcome.on_member_join")
     async def on_member_join(self, member):
+        self.recorder.record(member.guild.id, "joins")
         guild_id = str(member.guild.id)
         if guild_id not in self.config:
             return
@@ -52,7 +50,7 @@ class WelcomeSystem(commands.Cog):
             if role:
                 ping = f"{role.mention}"
 
-        await channel.send(content=ping, embed=embed)
+        await self.rest.send(COMMUNITY, channel, content=ping, embed=embed)
 
     welcome = discord.SlashCommandGroup("welcome", "Configurer le message de bienvenue")
 
@@ -65,7 +63,7 @@ class WelcomeSystem(commands.Cog):
             "gif_url": gif_url
         }
         self.config[str(ctx.guild.id)] = cfg
-        save_json(self.config_path, self.config)
+        self.store.save()
         await ctx.respond(f"✅ Bienvenue configuré avec le GIF : {gif_url}", ephemeral=False)
 
     @welcome.command(name="role", description="Ajouter un rôle à donner à l’arrivée")
@@ -75,7 +73,7 @@ class WelcomeSystem(commands.Cog):
         if gid not in self.config:
             return await ctx.respond("❌ Configure d’abord le message avec `/welcome create`.", ephemeral=False)
         self.config[gid]["role"] = str(rôle.id)
-        save_json(self.config_path, self.config)
+        self.store.save()
         await ctx.respond(f"✅ Rôle {rôle.mention} ajouté à la bienvenue.", ephemeral=False)
 
     @welcome.command(name="test", description="Tester le message de bienvenue")
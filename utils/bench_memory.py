@@ -0,0 +1,98 @@
+# utils/bench_memory.py
+"""Mémoire d'un gros serveur selon le profil (full / lean).
+
+    python -m utils.bench_memory [membres] [en_vocal]
+
+Construit un serveur synthétique comme au GUILD_CREATE, avec l'état de
+connexion d'un client configuré pour chaque profil, et mesure l'allocation
+avec tracemalloc.
+"""
+import asyncio
+import gc
+import os
+import sys
+import tracemalloc
+
+import discord
+
+from utils.profile import client_options
+
+VOICE_CHANNELS = 20
+
+
+def member_data(i):
+    return {
+        "user": {
+            "id": str(100000 + i),
+            "username": f"membre{i}",
+            "discriminator": "0",
+            "global_name": f"Membre {i}",
+            "avatar": None,
+            "bot": i % 50 == 0,
+        },
+        "nick": None,
+        "roles": [],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+    }
+
+
+def guild_data(members, in_voice):
+    channels = [
+        {"id": str(10 + c), "type": 2, "name": f"vocal-{c}", "position": c,
+         "permission_overwrites": [], "bitrate": 64000, "user_limit": 0, "parent_id": None}
+        for c in range(VOICE_CHANNELS)
+    ]
+    voice_states = [
+        {"user_id": str(100000 + i), "channel_id": str(10 + i % VOICE_CHANNELS),
+         "session_id": f"s{i}", "deaf": False, "mute": False, "self_deaf": False,
+         "self_mute": False, "suppress": False, "member": member_data(i)}
+        for i in range(in_voice)
+    ]
+    return {
+        "id": "1",
+        "name": "Bench",
+        "owner_id": "100001",
+        "large": True,
+        "member_count": members,
+        "features": [],
+        "emojis": [],
+        "stickers": [],
+        "roles": [{"id": "1", "name": "@everyone", "permissions": "0", "position": 0,
+                   "color": 0, "colors": {"primary_color": 0, "secondary_color": None, "tertiary_color": None},
+                   "hoist": False, "managed": False, "mentionable": False}],
+        "channels": channels,
+        "members": [member_data(i) for i in range(members)],
+        "voice_states": voice_states,
+    }
+
+
+async def measure(profile, members, in_voice, extensions):
+    client = discord.Client(**client_options(extensions, profile))
+    data = guild_data(members, in_voice)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    guild = discord.Guild(data=data, state=client._connection)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    cached = len(guild.members)
+    del data, guild
+    await client.close()
+    return used, cached
+
+
+def main(members=50000, in_voice=500):
+    extensions = [f"cogs.{f[:-3]}" for f in sorted(os.listdir("cogs"))
+                  if f.endswith(".py") and f != "__init__.py"]
+    print(f"Serveur synthétique : {members} membres, {in_voice} en vocal")
+    for profile in ("full", "lean"):
+        used, cached = asyncio.run(measure(profile, members, in_voice, extensions))
+        print(f"{profile:<5} {used / 1024 / 1024:8.1f} Mo  {cached:>7} membres en cache")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3] if a.isdigit()]
+    main(*args)
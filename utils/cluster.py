@@ -0,0 +1,178 @@
+# utils/cluster.py
+import glob
+import json
+import math
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import Counter
+
+from utils.storage import _atomic_write
+
+# SEIKO_SHARDS=auto|N : AutoShardedBot ; SEIKO_SHARD_IDS=0,1 : shards de ce processus.
+# SEIKO_CLUSTER=<n> est posé par le lanceur (python -m utils.cluster).
+CLUSTER = os.getenv("SEIKO_CLUSTER")
+HEALTH_DIR = "data/cluster"
+HEALTH_INTERVAL = 30
+HEALTH_STALE = 3 * HEALTH_INTERVAL
+RESTART_DELAY = 10
+GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+
+
+def sharding_options():
+    """Options de shards pour le client, ou None pour un bot non shardé."""
+    shards = os.getenv("SEIKO_SHARDS", "").strip().lower()
+    if not shards:
+        return None
+    options = {}
+    if shards != "auto":
+        options["shard_count"] = int(shards)
+    ids = [int(s) for s in os.getenv("SEIKO_SHARD_IDS", "").split(",") if s.strip().isdigit()]
+    if ids:
+        options["shard_ids"] = ids
+    return options
+
+
+def is_primary():
+    """Un seul processus s'occupe des tâches globales (synchro des commandes)."""
+    return CLUSTER in (None, "0")
+
+
+def shard_for(guild_id, shard_count):
+    return (int(guild_id) >> 22) % shard_count
+
+
+def owns(bot, guild_id):
+    """Vrai si ce serveur est servi par les shards de ce processus."""
+    shard_ids = getattr(bot, "shard_ids", None)
+    if not shard_ids or not bot.shard_count:
+        return True
+    if not str(guild_id).isdigit():
+        return is_primary()
+    return shard_for(guild_id, bot.shard_count) in shard_ids
+
+
+# === SANTÉ DES SHARDS ===
+def shard_health(bot):
+    guilds = Counter(g.shard_id or 0 for g in bot.guilds)
+    shards = getattr(bot, "shards", None)
+    if not shards:
+        items = [(bot.shard_id or 0, bot.latency, bot.is_closed())]
+    else:
+        items = [(sid, info.latency, info.is_closed()) for sid, info in sorted(shards.items())]
+    return [
+        {
+            "shard": sid,
+            "latency": round(latency * 1000) if math.isfinite(latency) else None,
+            "guilds": guilds[sid],
+            "closed": closed,
+        }
+        for sid, latency, closed in items
+    ]
+
+
+def write_health(bot):
+    report = {"cluster": CLUSTER or "0", "pid": os.getpid(), "ts": int(time.time()), "shards": shard_health(bot)}
+    _atomic_write(os.path.join(HEALTH_DIR, f"{report['cluster']}.json"), json.dumps(report))
+
+
+def read_health():
+    """Rapports de tous les processus ; un rapport trop ancien est marqué `stale`."""
+    reports = []
+    now = time.time()
+    for path in sorted(glob.glob(os.path.join(HEALTH_DIR, "*.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        report["stale"] = now - report["ts"] > HEALTH_STALE
+        reports.append(report)
+    return reports
+
+
+# === LANCEUR ===
+def recommended_shards(token):
+    request = urllib.request.Request(GATEWAY_URL, headers={
+        "Authorization": f"Bot {token}",
+        "User-Agent": "DiscordBot (Seiko, 1.0)",
+    })
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)["shards"]
+
+
+def shard_ranges(total, clusters):
+    """Découpe 0..total-1 en `clusters` plages contiguës de tailles proches."""
+    size, extra = divmod(total, clusters)
+    ranges, start = [], 0
+    for i in range(clusters):
+        end = start + size + (i < extra)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def launch(clusters, total=None):
+    token = os.getenv("TOKEN")
+    if not token:
+        print("❌ TOKEN manquant", file=sys.stderr)
+        sys.exit(1)
+    total = total or recommended_shards(token)
+    clusters = max(1, min(clusters, total))
+
+    # Un état partagé entre processus : SQLite, migré une seule fois ici.
+    os.environ["SEIKO_STORAGE"] = "sqlite"
+    from utils.database import Database, migrate_json
+    migrate_json(Database())
+
+    def spawn(cluster, shard_ids):
+        env = dict(
+            os.environ,
+            SEIKO_CLUSTER=str(cluster),
+            SEIKO_SHARDS=str(total),
+            SEIKO_SHARD_IDS=",".join(map(str, shard_ids)),
+        )
+        print(f"🚀 Cluster {cluster} : shards {shard_ids[0]}-{shard_ids[-1]} / {total}")
+        return subprocess.Popen([sys.executable, "bot.py"], env=env)
+
+    ranges = shard_ranges(total, clusters)
+    processes = {i: spawn(i, ids) for i, ids in enumerate(ranges)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    restarts = {}
+    while not stopping:
+        time.sleep(1)
+        for i, process in list(processes.items()):
+            if process.poll() is None:
+                continue
+            # ✅ Un cluster tombé est relancé seul, après un délai
+            due = restarts.setdefault(i, time.monotonic() + RESTART_DELAY)
+            if time.monotonic() >= due:
+                print(f"⚠️ Cluster {i} arrêté (code {process.returncode}), relance.", file=sys.stderr)
+                del restarts[i]
+                processes[i] = spawn(i, ranges[i])
+
+    for process in processes.values():
+        if process.poll() is None:
+            process.terminate()
+    for process in processes.values():
+        process.wait()
+
+
+if __name__ == "__main__":
+    # python -m utils.cluster <processus> [shards]
+    args = [int(a) for a in sys.argv[1:3] if a.isdigit()]
+    if not args:
+        print("Usage : python -m utils.cluster <processus> [shards]", file=sys.stderr)
+        sys.exit(1)
+    launch(*args)
@@ -0,0 +1,90 @@
+# utils/command_sync.py
+import hashlib
+import json
+import os
+import time
+
+from utils.storage import get_store
+
+CACHE_PATH = "data/command_tree.json"
+GLOBAL = "global"
+
+
+def command_scopes(bot):
+    """Commandes en attente regroupées par portée : "global" ou ID de serveur."""
+    scopes = {}
+    for cmd in bot.pending_application_commands:
+        for scope in (cmd.guild_ids or [GLOBAL]):
+            scopes.setdefault(str(scope), []).append(cmd)
+    return scopes
+
+
+def normalize(value):
+    """Forme canonique pour le hash : les ensembles (contexts, integration_types…) deviennent des listes triées."""
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return sorted((normalize(v) for v in value), key=lambda v: json.dumps(v, sort_keys=True, default=str))
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    return getattr(value, "value", value)
+
+
+def tree_hash(commands):
+    payload = sorted(json.dumps(normalize(cmd.to_dict()), sort_keys=True, default=str) for cmd in commands)
+    return hashlib.sha256("\n".join(payload).encode("utf-8")).hexdigest()
+
+
+async def bind_ids(bot, commands, guild_id):
+    """Associe les commandes locales à leurs IDs Discord sans rien envoyer.
+
+    Retourne False si une commande manque côté Discord (l'arbre distant a changé).
+    """
+    app_id = bot.application_id or bot.user.id
+    if guild_id is None:
+        remote = await bot.http.get_global_commands(app_id)
+    else:
+        remote = await bot.http.get_guild_commands(app_id, guild_id)
+    ids = {(c["name"], int(c.get("type", 1))): int(c["id"]) for c in remote}
+    found = {}
+    for cmd in commands:
+        key = (cmd.name, int(getattr(cmd.type, "value", cmd.type)))
+        if key not in ids:
+            return False
+        found[cmd] = ids[key]
+    for cmd, cmd_id in found.items():
+        cmd.id = cmd_id
+        bot._application_commands[cmd_id] = cmd
+    return True
+
+
+async def sync_if_changed(bot, force=None, upload=True):
+    """Synchronise uniquement les portées dont l'arbre de commandes a changé.
+
+    Le hash de chaque portée est gardé sur disque ; SEIKO_FORCE_SYNC=1 force
+    l'envoi complet. Les portées inchangées (et toutes, si upload=False) sont
+    seulement liées à leurs IDs distants, sans envoi. Retourne la liste des
+    portées envoyées.
+    """
+    if force is None:
+        force = os.getenv("SEIKO_FORCE_SYNC") == "1"
+    store = get_store(CACHE_PATH, {})
+    cached = store.data
+    synced = []
+    for scope, commands in command_scopes(bot).items():
+        digest = tree_hash(commands)
+        guild_id = None if scope == GLOBAL else int(scope)
+        if not upload or (not force and cached.get(scope) == digest):
+            # ✅ IDs liés même sans envoi, sinon les commandes ne sont pas routées
+            if await bind_ids(bot, commands, guild_id):
+                continue
+            if not upload:
+                print(f"⚠️ Commandes absentes côté Discord ({scope}), en attente du cluster 0.")
+                continue
+        started = time.perf_counter()
+        await bot.register_commands(commands, guild_id=guild_id, method="bulk", force=True)
+        cached[scope] = digest
+        store.save()
+        synced.append(scope)
+        print(f"🌐 Commandes synchronisées ({scope}) en {time.perf_counter() - started:.2f}s.")
+    return synced
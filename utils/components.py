@@ -0,0 +1,106 @@
+# utils/components.py
+import time
+
+import discord
+
+from utils.metrics import histogram, FAST_BUCKETS
+
+# custom_id structuré : "<domaine>:<action>[:<argument>...]", ex. "gw:join:1717000000".
+SEP = ":"
+
+_router = None
+
+
+class ComponentRouter:
+    """Table centrale des composants : une recherche dans un dict par clic.
+
+    Les cogs enregistrent un handler par "<domaine>:<action>" ; les vues
+    persistantes (`add_view`, au premier on_ready) renvoient leurs clics ici.
+    Un clic qu'aucune vue vivante ne sert (vieux message, giveaway terminé)
+    arrive par `on_interaction` et passe par la même table.
+    """
+
+    def __init__(self):
+        self.handlers = {}
+        # Anciens custom_id non structurés : préfixe -> clé, ex. "gw_join_" -> "gw:join"
+        self.aliases = {}
+        # custom_id servis par une vue enregistrée dans ce processus
+        self.live = set()
+        self.attached = False
+
+    def register(self, key, handler):
+        self.handlers[key] = handler
+
+    def alias(self, prefix, key):
+        self.aliases[prefix] = key
+
+    def parse(self, custom_id):
+        for prefix, key in self.aliases.items():
+            if custom_id.startswith(prefix):
+                return key, [custom_id[len(prefix):]]
+        parts = custom_id.split(SEP)
+        return SEP.join(parts[:2]), parts[2:]
+
+    async def dispatch(self, interaction):
+        key, args = self.parse(interaction.data.get("custom_id", ""))
+        handler = self.handlers.get(key)
+        if handler is None:
+            return False
+        started = time.perf_counter()
+        try:
+            await handler(interaction, *args)
+        finally:
+            histogram("component_seconds", FAST_BUCKETS, component=key).observe(time.perf_counter() - started)
+        return True
+
+    def attach(self, bot):
+        """Un seul écouteur pour tout le bot, ajouté par le premier cog qui s'en sert."""
+        if not self.attached:
+            self.attached = True
+            bot.add_listener(self.on_interaction, "on_interaction")
+
+    async def on_interaction(self, interaction):
+        if interaction.type != discord.InteractionType.component:
+            return
+        if interaction.data.get("custom_id", "") in self.live:
+            return
+        await self.dispatch(interaction)
+
+    def track(self, view):
+        self.live.update(item.custom_id for item in view.children if getattr(item, "custom_id", None))
+        return view
+
+    def add_view(self, bot, view):
+        bot.add_view(self.track(view))
+
+    def release(self, view):
+        view.stop()
+        self.live.difference_update(item.custom_id for item in view.children)
+
+
+def get_router():
+    global _router
+    if _router is None:
+        _router = ComponentRouter()
+    return _router
+
+
+def custom_id(key, *args):
+    return SEP.join((key, *map(str, args)))
+
+
+class RoutedButton(discord.ui.Button):
+    async def callback(self, interaction):
+        await get_router().dispatch(interaction)
+
+
+class RoutedSelect(discord.ui.Select):
+    async def callback(self, interaction):
+        await get_router().dispatch(interaction)
+
+
+def persistent_view(*items):
+    view = discord.ui.View(timeout=None)
+    for item in items:
+        view.add_item(item)
+    return view
@@ -0,0 +1,328 @@
+# utils/database.py
+import json
+import os
+import sqlite3
+import sys
+
+# Moteur SQLite optionnel pour la modération, les tickets et les giveaways.
+# Activé avec SEIKO_STORAGE=sqlite ; sinon les cogs restent sur les JSON.
+DB_PATH = os.getenv("SEIKO_DB", "data/seiko.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS warns (
+    id INTEGER PRIMARY KEY,
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    moderator TEXT,
+    reason TEXT,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS warns_by_user ON warns (guild_id, user_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS bans (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    moderator TEXT,
+    reason TEXT,
+    timestamp TEXT,
+    expires_at INTEGER,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS mutes (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    moderator TEXT,
+    reason TEXT,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS tickets (
+    channel_id TEXT PRIMARY KEY,
+    guild_id TEXT,
+    user_id TEXT NOT NULL,
+    number INTEGER,
+    category TEXT,
+    state TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    closed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS tickets_by_state ON tickets (guild_id, state);
+CREATE INDEX IF NOT EXISTS tickets_by_user ON tickets (guild_id, user_id, state);
+CREATE INDEX IF NOT EXISTS tickets_by_closed ON tickets (state, closed_at);
+
+CREATE TABLE IF NOT EXISTS ticket_counters (
+    guild_id TEXT PRIMARY KEY,
+    next INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS giveaways (
+    guild_id TEXT NOT NULL,
+    giveaway_id TEXT NOT NULL,
+    title TEXT,
+    description TEXT,
+    end_time INTEGER NOT NULL,
+    winners INTEGER NOT NULL,
+    channel_id TEXT,
+    host TEXT,
+    ended INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, giveaway_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS giveaways_by_end ON giveaways (ended, end_time);
+
+CREATE TABLE IF NOT EXISTS giveaway_participants (
+    guild_id TEXT NOT NULL,
+    giveaway_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    PRIMARY KEY (guild_id, giveaway_id, user_id)
+) WITHOUT ROWID;
+"""
+
+TICKET_FIELDS = ("guild_id", "user_id", "number", "category", "state", "created_at", "closed_at")
+
+_database = None
+
+
+class Database:
+    def __init__(self, path=DB_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # Mode cluster : un autre processus peut tenir le verrou d'écriture
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(SCHEMA)
+        self._upgrade()
+
+    def _upgrade(self):
+        # Colonnes ajoutées après la première version du schéma.
+        columns = {r["name"] for r in self.execute("PRAGMA table_info(bans)")}
+        if "expires_at" not in columns:
+            self.execute("ALTER TABLE bans ADD COLUMN expires_at INTEGER")
+        self.execute("CREATE INDEX IF NOT EXISTS bans_by_expiry ON bans (expires_at) WHERE expires_at IS NOT NULL")
+
+    def execute(self, sql, params=()):
+        return self.conn.execute(sql, params)
+
+    def get_meta(self, key):
+        row = self.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key, value):
+        self.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # === MODÉRATION ===
+    def add_warn(self, guild_id, user_id, warn):
+        self.execute(
+            "INSERT INTO warns (guild_id, user_id, moderator, reason, timestamp) VALUES (?, ?, ?, ?, ?)",
+            (guild_id, user_id, warn["moderator"], warn["reason"], warn["timestamp"])
+        )
+
+    def get_warns(self, guild_id, user_id, limit=10):
+        rows = self.execute(
+            "SELECT moderator, reason, timestamp FROM warns WHERE guild_id = ? AND user_id = ? "
+            "ORDER BY timestamp LIMIT ?",
+            (guild_id, user_id, limit)
+        )
+        return [dict(r) for r in rows]
+
+    def set_ban(self, guild_id, user_id, ban):
+        self.execute(
+            "INSERT OR REPLACE INTO bans (guild_id, user_id, moderator, reason, timestamp, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (guild_id, user_id, ban["moderator"], ban["reason"], ban["timestamp"], ban.get("expires_at"))
+        )
+
+    def remove_ban(self, guild_id, user_id):
+        self.execute("DELETE FROM bans WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+
+    def pending_bans(self):
+        rows = self.execute(
+            "SELECT guild_id, user_id, expires_at FROM bans WHERE expires_at IS NOT NULL ORDER BY expires_at"
+        )
+        return [(r["guild_id"], r["user_id"], r["expires_at"]) for r in rows]
+
+    def set_mute(self, guild_id, user_id, mute):
+        self.execute(
+            "INSERT OR REPLACE INTO mutes (guild_id, user_id, moderator, reason) VALUES (?, ?, ?, ?)",
+            (guild_id, user_id, mute["moderator"], mute["reason"])
+        )
+
+    def remove_mute(self, guild_id, user_id):
+        self.execute("DELETE FROM mutes WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+
+    # === TICKETS ===
+    def upsert_ticket(self, channel_id, ticket):
+        self.execute(
+            "INSERT OR REPLACE INTO tickets (channel_id, guild_id, user_id, number, category, state, created_at, closed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (channel_id, *(ticket.get(f) for f in TICKET_FIELDS))
+        )
+
+    def get_ticket(self, channel_id):
+        row = self.execute(
+            "SELECT guild_id, user_id, number, category, state, created_at, closed_at FROM tickets WHERE channel_id = ?",
+            (channel_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def remove_ticket(self, channel_id):
+        self.execute("DELETE FROM tickets WHERE channel_id = ?", (channel_id,))
+
+    def reserve_ticket_numbers(self, guild_id, count, start=1):
+        """Réserve `count` numéros consécutifs et retourne le premier."""
+        self.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.execute("SELECT next FROM ticket_counters WHERE guild_id = ?", (guild_id,)).fetchone()
+            first = row["next"] if row else start
+            self.execute(
+                "INSERT OR REPLACE INTO ticket_counters (guild_id, next) VALUES (?, ?)",
+                (guild_id, first + count)
+            )
+            self.execute("COMMIT")
+        except Exception:
+            self.execute("ROLLBACK")
+            raise
+        return first
+
+    def all_tickets(self):
+        rows = self.execute(
+            "SELECT channel_id, guild_id, user_id, number, category, state, created_at, closed_at FROM tickets"
+        )
+        return [(r["channel_id"], dict(r)) for r in rows]
+
+    def closed_tickets(self):
+        rows = self.execute(
+            "SELECT channel_id, closed_at FROM tickets WHERE state = 'CLOSED' AND closed_at IS NOT NULL ORDER BY closed_at"
+        )
+        return [(r["channel_id"], r["closed_at"]) for r in rows]
+
+    # === GIVEAWAYS ===
+    def create_giveaway(self, guild_id, giveaway_id, gw):
+        self.execute(
+            "INSERT OR REPLACE INTO giveaways (guild_id, giveaway_id, title, description, end_time, winners, channel_id, host, ended) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (guild_id, giveaway_id, gw["title"], gw["description"], gw["end_time"], gw["winners"],
+             gw["channel_id"], gw.get("host"), int(gw.get("ended", False)))
+        )
+
+    def get_giveaway(self, guild_id, giveaway_id):
+        row = self.execute(
+            "SELECT title, description, end_time, winners, channel_id, host, ended FROM giveaways "
+            "WHERE guild_id = ? AND giveaway_id = ?",
+            (guild_id, giveaway_id)
+        ).fetchone()
+        if not row:
+            return None
+        gw = dict(row)
+        gw["ended"] = bool(gw["ended"])
+        return gw
+
+    def list_giveaways(self, guild_id):
+        rows = self.execute(
+            "SELECT giveaway_id, title, end_time, ended FROM giveaways WHERE guild_id = ? ORDER BY end_time DESC",
+            (guild_id,)
+        )
+        return {r["giveaway_id"]: {"title": r["title"], "end_time": r["end_time"], "ended": bool(r["ended"])} for r in rows}
+
+    def pending_giveaways(self):
+        rows = self.execute("SELECT guild_id, giveaway_id, end_time FROM giveaways WHERE ended = 0")
+        return [(r["guild_id"], r["giveaway_id"], r["end_time"]) for r in rows]
+
+    def set_giveaway_ended(self, guild_id, giveaway_id, ended=True):
+        self.execute(
+            "UPDATE giveaways SET ended = ? WHERE guild_id = ? AND giveaway_id = ?",
+            (int(ended), guild_id, giveaway_id)
+        )
+
+    def add_participants(self, guild_id, giveaway_id, user_ids):
+        self.insert_participants([(guild_id, giveaway_id, uid) for uid in user_ids])
+
+    def insert_participants(self, rows):
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO giveaway_participants (guild_id, giveaway_id, user_id) VALUES (?, ?, ?)",
+            rows
+        )
+
+    def get_participants(self, guild_id, giveaway_id):
+        rows = self.execute(
+            "SELECT user_id FROM giveaway_participants WHERE guild_id = ? AND giveaway_id = ?",
+            (guild_id, giveaway_id)
+        )
+        return [r["user_id"] for r in rows]
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+        return json.loads(content) if content else None
+
+
+def migrate_json(db, data_dir="data"):
+    """Importe une seule fois les anciens fichiers JSON dans la base."""
+    if db.get_meta("json_migrated"):
+        return False
+
+    db.execute("BEGIN")
+    try:
+        moderation = _read_json(os.path.join(data_dir, "moderation.json")) or {}
+        for gid, users in moderation.get("warns", {}).items():
+            for uid, warns in users.items():
+                for w in warns:
+                    db.add_warn(gid, uid, w)
+        # Les anciens bans/mutes n'étaient pas rangés par serveur.
+        for key, entry in moderation.get("bans", {}).items():
+            if "moderator" in entry:
+                db.set_ban("", key, {"timestamp": None, **entry})
+                continue
+            for uid, ban in entry.items():
+                db.set_ban(key, uid, ban)
+        for uid, mute in moderation.get("mutes", {}).items():
+            db.set_mute("", uid, mute)
+
+        tickets = _read_json(os.path.join(data_dir, "tickets_seiko_v10.json")) or {}
+        for ch_id, ticket in tickets.get("tickets", {}).items():
+            db.upsert_ticket(ch_id, ticket)
+
+        giveaways = _read_json(os.path.join(data_dir, "giveaways.json")) or {}
+        for gid, guild_giveaways in giveaways.items():
+            for gwid, gw in guild_giveaways.items():
+                db.create_giveaway(gid, gwid, gw)
+                db.add_participants(gid, gwid, gw.get("participants", []))
+
+        db.set_meta("json_migrated", "1")
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+    return True
+
+
+def get_database():
+    """Retourne la base partagée, ou None si le backend SQLite n'est pas activé."""
+    global _database
+    if os.getenv("SEIKO_STORAGE", "json").lower() != "sqlite":
+        return None
+    if _database is None:
+        _database = Database()
+        if migrate_json(_database):
+            print(f"📦 Données JSON migrées vers {_database.path}.")
+    return _database
+
+
+if __name__ == "__main__":
+    # python -m utils.database migrate
+    if sys.argv[1:] != ["migrate"]:
+        print("Usage : python -m utils.database migrate", file=sys.stderr)
+        sys.exit(1)
+    done = migrate_json(Database())
+    print("✅ Migration terminée." if done else "ℹ️ Migration déjà effectuée.")
@@ -0,0 +1,71 @@
+# utils/message_cache.py
+import sys
+from collections import OrderedDict, namedtuple
+
+# Juste ce qu'il faut aux logs : pas d'objet Message complet.
+CachedMessage = namedtuple("CachedMessage", "author_id channel_id content attachments")
+
+# Coût fixe estimé d'une entrée (tuple, clé, liens de l'OrderedDict).
+ENTRY_OVERHEAD = 160
+
+
+class MessageCache:
+    """LRU par serveur avec un budget mémoire, pour logger les messages hors cache."""
+
+    def __init__(self, budget_per_guild=1024 * 1024, content_limit=500):
+        self.budget = budget_per_guild
+        self.content_limit = content_limit
+        self.guilds = {}
+        self.sizes = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _cost(self, entry):
+        return ENTRY_OVERHEAD + sys.getsizeof(entry.content)
+
+    def put(self, guild_id, message_id, author_id, channel_id, content, attachments=0):
+        entries = self.guilds.setdefault(guild_id, OrderedDict())
+        old = entries.pop(message_id, None)
+        if old is not None:
+            self.sizes[guild_id] -= self._cost(old)
+        entry = CachedMessage(author_id, channel_id, (content or "")[:self.content_limit], attachments)
+        entries[message_id] = entry
+        size = self.sizes.get(guild_id, 0) + self._cost(entry)
+        while size > self.budget and len(entries) > 1:
+            _, evicted = entries.popitem(last=False)
+            size -= self._cost(evicted)
+        self.sizes[guild_id] = size
+
+    def get(self, guild_id, message_id):
+        entries = self.guilds.get(guild_id)
+        entry = entries.get(message_id) if entries else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entries.move_to_end(message_id)
+        return entry
+
+    def pop(self, guild_id, message_id):
+        entries = self.guilds.get(guild_id)
+        entry = entries.pop(message_id, None) if entries else None
+        if entry is not None:
+            self.sizes[guild_id] -= self._cost(entry)
+            if not entries:
+                del self.guilds[guild_id]
+                del self.sizes[guild_id]
+        return entry
+
+    def drop_guild(self, guild_id):
+        self.guilds.pop(guild_id, None)
+        self.sizes.pop(guild_id, None)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def memory(self):
+        return sum(self.sizes.values())
+
+    def __len__(self):
+        return sum(len(e) for e in self.guilds.values())
@@ -0,0 +1,173 @@
+# utils/metrics.py
+import bisect
+import functools
+import math
+import re
+import time
+
+# Bornes par défaut en secondes (latences d'interactions et d'appels REST).
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0)
+# Handlers d'événements et écritures disque : surtout sous les 50 ms.
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+PREFIX = "seiko_"
+
+_histograms = {}
+_counters = {}
+_gauges = {}
+
+
+def _key(name, labels):
+    # Sans labels la clé reste le nom seul : histograms() / counters() inchangés.
+    return (name, tuple(sorted(labels.items()))) if labels else name
+
+
+class Counter:
+    def __init__(self, name, labels=None):
+        self.name = name
+        self.labels = labels or {}
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Histogram:
+    """Histogramme à seaux fixes : mémoire constante, quantiles approchés."""
+
+    def __init__(self, name, buckets=DEFAULT_BUCKETS, labels=None):
+        self.name = name
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Borne haute du seau qui contient le quantile `q` (None si vide)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def summary(self):
+        if not self.count:
+            return "aucune mesure"
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        return f"n={self.count} • moy. {self.mean():.2f}s • p50 ≤ {p50}s • p95 ≤ {p95}s"
+
+
+def histogram(name, buckets=DEFAULT_BUCKETS, **labels):
+    key = _key(name, labels)
+    h = _histograms.get(key)
+    if h is None:
+        h = _histograms[key] = Histogram(name, buckets, labels)
+    return h
+
+
+def histograms():
+    return dict(_histograms)
+
+
+def counter(name, **labels):
+    key = _key(name, labels)
+    c = _counters.get(key)
+    if c is None:
+        c = _counters[key] = Counter(name, labels)
+    return c
+
+
+def counters():
+    return dict(_counters)
+
+
+def gauge(name, func):
+    """Valeur lue au moment de l'export : `func()` -> nombre ou [(labels, nombre)]."""
+    _gauges[name] = func
+
+
+def timed(name, buckets=FAST_BUCKETS, **labels):
+    """Décorateur : durée de chaque appel de la coroutine dans un histogramme."""
+    def decorator(func):
+        h = histogram(name, buckets, **labels)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                h.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+_ID = re.compile(r"\d{15,}")
+
+
+def route_template(route):
+    """`channels/123/messages` -> `channels/:id/messages` (un label par type de route)."""
+    return _ID.sub(":id", route)
+
+
+# === EXPORT PROMETHEUS (format texte 0.0.4) ===
+def _labels(labels, extra=None):
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    families = {}
+    for c in list(_counters.values()):
+        families.setdefault((c.name, "counter"), []).append(c)
+    for h in list(_histograms.values()):
+        families.setdefault((h.name, "histogram"), []).append(h)
+
+    lines = []
+    for (name, kind), metrics in sorted(families.items()):
+        full = PREFIX + name + ("_total" if kind == "counter" else "")
+        # Le nom annoncé par TYPE doit être celui des échantillons (suffixe _total compris)
+        lines.append(f"# TYPE {full} {kind}")
+        for m in metrics:
+            if kind == "counter":
+                lines.append(f"{full}{_labels(m.labels)} {m.value}")
+                continue
+            cumulative = 0
+            for bound, n in zip(m.buckets + (math.inf,), m.counts):
+                cumulative += n
+                lines.append(f"{full}_bucket{_labels(m.labels, ('le', _number(bound)))} {cumulative}")
+            lines.append(f"{full}_sum{_labels(m.labels)} {_number(m.sum)}")
+            lines.append(f"{full}_count{_labels(m.labels)} {m.count}")
+
+    for name, func in sorted(_gauges.items()):
+        try:
+            value = func()
+        except Exception:
+            continue
+        lines.append(f"# TYPE {PREFIX + name} gauge")
+        samples = value if isinstance(value, list) else [({}, value)]
+        for labels, v in samples:
+            if v is not None and math.isfinite(v):
+                lines.append(f"{PREFIX + name}{_labels(labels)} {_number(v)}")
+    return "\n".join(lines) + "\n"
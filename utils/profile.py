@@ -0,0 +1,69 @@
+# utils/profile.py
+import importlib
+import os
+
+import discord
+
+# SEIKO_PROFILE=full (défaut) : Intents.all(), cache complet, chunking au démarrage.
+# SEIKO_PROFILE=lean : seulement les intents déclarés par les cogs (INTENTS),
+# cache membres réduit (SEIKO_MEMBER_CACHE) et chunking à la demande.
+PROFILE = os.getenv("SEIKO_PROFILE", "full").lower()
+MEMBER_CACHE = os.getenv("SEIKO_MEMBER_CACHE", "voice").lower()
+
+MEMBER_CACHE_POLICIES = {
+    "all": discord.MemberCacheFlags.all,
+    # Membres en vocal uniquement (nécessaire aux vocs temporaires)
+    "voice": lambda: discord.MemberCacheFlags(voice=True, joined=False),
+    # Membres en vocal + arrivés depuis le démarrage (actifs récents)
+    "joined": lambda: discord.MemberCacheFlags(voice=True, joined=True),
+    "none": discord.MemberCacheFlags.none,
+}
+
+
+def is_lean():
+    return PROFILE == "lean"
+
+
+def declared_intents(extensions):
+    """Union des intents déclarés par les cogs ; None si un cog ne déclare rien."""
+    names = set()
+    for name in extensions:
+        try:
+            module = importlib.import_module(name)
+        except Exception:
+            # Le cog ne sera pas chargé non plus ; load_extension affichera l'erreur
+            continue
+        needs = getattr(module, "INTENTS", None)
+        if needs is None:
+            return None
+        names.update(needs)
+    return names
+
+
+def client_options(extensions, profile=None):
+    if (profile or PROFILE) != "lean":
+        return {"intents": discord.Intents.all()}
+    names = declared_intents(extensions)
+    if names is None:
+        intents = discord.Intents.all()
+        intents.presences = False
+    else:
+        intents = discord.Intents.none()
+        for name in names:
+            setattr(intents, name, True)
+    policy = MEMBER_CACHE_POLICIES.get(MEMBER_CACHE, MEMBER_CACHE_POLICIES["voice"])()
+    # Chaque drapeau du cache exige son intent, sinon le client refuse de démarrer
+    policy.voice = policy.voice and intents.voice_states
+    policy.joined = policy.joined and intents.members
+    return {
+        "intents": intents,
+        "member_cache_flags": policy,
+        "chunk_guilds_at_startup": False,
+    }
+
+
+async def chunk_members(guild):
+    """Liste complète des membres : depuis le cache s'il est complet, sinon un chunk non mis en cache."""
+    if guild.chunked:
+        return guild.members
+    return await guild.chunk(cache=False)
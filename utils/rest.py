@@ -0,0 +1,164 @@
+# utils/rest.py
+import asyncio
+import itertools
+import logging
+import re
+import time
+from collections import defaultdict, deque
+
+from utils.metrics import counter, histogram, route_template
+
+# Classes de priorité : plus petit = servi en premier.
+INTERACTION = 0
+MODERATION = 1
+TICKETS = VOICE = COMMUNITY = 2
+LOGS = 3
+BACKGROUND = 4
+
+PRIORITY_NAMES = {INTERACTION: "interaction", MODERATION: "moderation", TICKETS: "tickets/voice", LOGS: "logs",
+                  BACKGROUND: "background"}
+
+_rest = None
+_BUCKET_PARAM = re.compile(r"\{\w+\}")
+
+
+class RateLimitCounter(logging.Filter):
+    """Compte les 429 : py-cord les gère lui-même et journalise chacun une fois.
+
+    Seul point de comptage : un 429 global est aussi journalisé sous son
+    bucket, et un appel qui échoue après ses essais a déjà été compté ici.
+    """
+
+    def filter(self, record):
+        if (isinstance(record.msg, str) and record.msg.startswith("We are being rate limited")
+                and len(record.args) >= 2):
+            # bucket py-cord : "<channel_id>:<guild_id>:/channels/{channel_id}/messages"
+            path = str(record.args[1]).rsplit(":", 1)[-1]
+            counter("rest_ratelimited", route=_BUCKET_PARAM.sub(":id", path).lstrip("/")).inc()
+        return True
+
+
+class RestScheduler:
+    """File centrale des appels REST sortants, servie par priorité.
+
+    Au plus `workers` appels en vol au total et `route_limit` par route
+    (ex. `channels/<id>/messages`). Un appel dont la route est saturée est mis
+    de côté sans bloquer de place, puis remis en file quand la route se libère.
+    Les classes LOGS et BACKGROUND n'occupent jamais plus de `low_limit`
+    places : une rafale de logs ne retarde pas les interactions qui arrivent.
+    """
+
+    def __init__(self, workers=8, route_limit=2, route_limits=None, low_limit=None):
+        self.route_limit = route_limit
+        self.route_limits = route_limits or {}
+        self.low_limit = low_limit or max(1, workers // 2)
+        self._low_inflight = 0
+        self._low_parked = deque()
+        # Références fortes : sans elles, une tâche en cours peut être ramassée par le GC
+        self._tasks = set()
+        self._queue = asyncio.PriorityQueue()
+        self._slots = asyncio.Semaphore(workers)
+        self._counter = itertools.count()
+        self._inflight = defaultdict(int)
+        self._parked = defaultdict(deque)
+        self._task = None
+        self.queued = defaultdict(int)
+        self.completed = defaultdict(int)
+        self.failed = defaultdict(int)
+
+    def _limit(self, route):
+        for prefix, limit in self.route_limits.items():
+            if route.startswith(prefix):
+                return limit
+        return self.route_limit
+
+    def ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._dispatch())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def call(self, priority, route, func, *args, **kwargs):
+        """Met `func(*args, **kwargs)` en file et attend son résultat."""
+        self.ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self.queued[priority] += 1
+        self._queue.put_nowait((priority, next(self._counter), route, func, args, kwargs, future))
+        return await future
+
+    async def send(self, priority, channel, *args, **kwargs):
+        return await self.call(priority, f"channels/{channel.id}/messages", channel.send, *args, **kwargs)
+
+    async def dm(self, priority, user, *args, **kwargs):
+        return await self.call(priority, f"users/{user.id}/dm", user.send, *args, **kwargs)
+
+    async def _dispatch(self):
+        while True:
+            await self._slots.acquire()
+            item = await self._queue.get()
+            priority, route = item[0], item[2]
+            if priority >= LOGS and self._low_inflight >= self.low_limit:
+                self._low_parked.append(item)
+                self._slots.release()
+                continue
+            if self._inflight[route] >= self._limit(route):
+                self._parked[route].append(item)
+                self._slots.release()
+                continue
+            if priority >= LOGS:
+                self._low_inflight += 1
+            self._inflight[route] += 1
+            self.queued[priority] -= 1
+            task = asyncio.create_task(self._run(item))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, item):
+        priority, _, route, func, args, kwargs, future = item
+        template = route_template(route)
+        started = time.perf_counter()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            self.failed[priority] += 1
+            counter("rest_errors", route=template).inc()
+            if not future.done():
+                future.set_exception(e)
+        else:
+            self.completed[priority] += 1
+            if not future.done():
+                future.set_result(result)
+        finally:
+            # Durée vue par l'appelant, attentes de rate limit comprises
+            histogram("rest_request_seconds", route=template).observe(time.perf_counter() - started)
+            self._inflight[route] -= 1
+            if not self._inflight[route]:
+                del self._inflight[route]
+            self._slots.release()
+            if priority >= LOGS:
+                self._low_inflight -= 1
+                if self._low_parked:
+                    self._queue.put_nowait(self._low_parked.popleft())
+            parked = self._parked.get(route)
+            if parked:
+                self._queue.put_nowait(parked.popleft())
+                if not parked:
+                    del self._parked[route]
+
+    def depth(self):
+        """Appels en attente par classe de priorité."""
+        return {PRIORITY_NAMES.get(p, str(p)): n for p, n in sorted(self.queued.items())}
+
+    def inflight(self):
+        return sum(self._inflight.values())
+
+
+def get_rest():
+    global _rest
+    if _rest is None:
+        _rest = RestScheduler()
+        logging.getLogger("discord.http").addFilter(RateLimitCounter())
+    return _rest
@@ -0,0 +1,94 @@
+# utils/scheduler.py
+import asyncio
+import heapq
+import itertools
+import sys
+import time
+
+
+class DeadlineScheduler:
+    """Min-tas d'échéances servi par une seule tâche qui dort jusqu'à la prochaine.
+
+    `callback(key)` est appelé (coroutine) quand l'échéance de `key` est passée.
+    Replanifier ou annuler une clé laisse l'ancienne entrée dans le tas ; elle est
+    ignorée au moment où elle remonte.
+    """
+
+    def __init__(self, callback, concurrency=5):
+        self.callback = callback
+        self._heap = []
+        self._deadlines = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._limit = asyncio.Semaphore(concurrency)
+        self._task = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def schedule(self, key, when):
+        """Planifie `key` au timestamp `when` (secondes epoch)."""
+        self._deadlines[key] = when
+        heapq.heappush(self._heap, (when, next(self._counter), key))
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+        self.ensure_started()
+
+    def cancel(self, key):
+        self._deadlines.pop(key, None)
+
+    def next_deadline(self):
+        self._purge()
+        return self._heap[0][0] if self._heap else None
+
+    def ensure_started(self):
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _purge(self):
+        while self._heap:
+            when, _, key = self._heap[0]
+            if self._deadlines.get(key) == when:
+                return
+            heapq.heappop(self._heap)
+
+    async def _run(self):
+        while True:
+            self._purge()
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            when, _, key = self._heap[0]
+            delay = when - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            del self._deadlines[key]
+            await self._limit.acquire()
+            asyncio.create_task(self._fire(key))
+
+    async def _fire(self, key):
+        try:
+            await self.callback(key)
+        except Exception as e:
+            print(f"❌ Échéance {key} : {e}", file=sys.stderr)
+        finally:
+            self._limit.release()
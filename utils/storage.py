@@ -0,0 +1,256 @@
+# utils/storage.py
+import asyncio
+import atexit
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from utils.metrics import histogram, route_template, FAST_BUCKETS
+
+# Délai de regroupement : toutes les modifications faites dans cette fenêtre
+# partent dans une seule écriture disque.
+FLUSH_DELAY = 2.0
+# Mode cluster : plusieurs processus partagent data/. Chaque écriture JSON
+# fusionne alors ses changements avec le fichier sur disque au lieu de l'écraser.
+SHARED = os.getenv("SEIKO_CLUSTER") is not None
+
+_stores = {}
+_logs = []
+
+
+def _atomic_write(path, payload):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        binary = isinstance(payload, bytes)
+        with os.fdopen(fd, "wb" if binary else "w", encoding=None if binary else "utf-8") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _merge(base, ours, theirs):
+    """Fusion à trois : nos changements depuis `base` appliqués sur `theirs`."""
+    if ours == base:
+        return theirs
+    if not (isinstance(base, dict) and isinstance(ours, dict) and isinstance(theirs, dict)):
+        return ours
+    merged = dict(theirs)
+    for key in base.keys() | ours.keys():
+        if key not in ours:
+            merged.pop(key, None)
+        elif key in theirs:
+            merged[key] = _merge(base.get(key, {}), ours[key], theirs[key])
+        elif key not in base or ours[key] != base[key]:
+            merged[key] = ours[key]
+    return merged
+
+
+class JsonStore:
+    """Fichier JSON gardé en mémoire, réécrit en différé et de façon atomique."""
+
+    def __init__(self, path, default, delay=FLUSH_DELAY):
+        self.path = path
+        self.delay = delay
+        self.data = self._read(default)
+        self._dirty = False
+        self._handle = None
+        self._seq = 0
+        self._written = 0
+        self._lock = threading.Lock()
+        # Dernier état écrit par ce processus, point de départ des fusions
+        self._base = json.loads(json.dumps(self.data)) if SHARED else None
+        self._flush_time = histogram("storage_flush_seconds", FAST_BUCKETS, file=route_template(path))
+
+    def _read(self, default):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+                return json.loads(content) if content else default
+        return default
+
+    def save(self):
+        """Marque les données comme modifiées ; l'écriture réelle est regroupée."""
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.flush_sync()
+        if self._handle is None:
+            self._handle = loop.call_later(self.delay, self._start_flush)
+
+    def _start_flush(self):
+        self._handle = None
+        asyncio.ensure_future(self.flush())
+
+    def _snapshot(self):
+        # La sérialisation se fait sur la boucle : personne ne modifie
+        # self.data pendant qu'on le parcourt.
+        self._dirty = False
+        self._seq += 1
+        return self._seq, json.dumps(self.data, ensure_ascii=False, separators=(",", ":"))
+
+    def _write(self, seq, payload):
+        with self._lock:
+            # Une écriture plus récente est déjà passée : on ne revient pas en arrière.
+            if seq <= self._written:
+                return
+            if SHARED:
+                self._write_shared(payload)
+            else:
+                _atomic_write(self.path, payload)
+            self._written = seq
+
+    def _write_shared(self, payload):
+        import fcntl
+
+        ours = json.loads(payload)
+        with open(self.path + ".lock", "a") as lock:
+            # Verrou inter-processus : lecture, fusion et écriture d'un seul tenant
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                theirs = self._read(None)
+                merged = ours if theirs is None else _merge(self._base, ours, theirs)
+                _atomic_write(self.path, json.dumps(merged, ensure_ascii=False, separators=(",", ":")))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self._base = ours
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        seq, payload = self._snapshot()
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._write, seq, payload)
+        except Exception as e:
+            print(f"❌ Écriture {self.path} échouée : {e}", file=sys.stderr)
+            self.save()
+        else:
+            self._flush_time.observe(time.perf_counter() - started)
+
+    def flush_sync(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if not self._dirty:
+            return
+        seq, payload = self._snapshot()
+        started = time.perf_counter()
+        self._write(seq, payload)
+        self._flush_time.observe(time.perf_counter() - started)
+
+
+class AppendLog:
+    """Journal en ajout seul : les lignes sont regroupées puis ajoutées hors de la boucle."""
+
+    def __init__(self, path, delay=FLUSH_DELAY):
+        self.path = path
+        self.delay = delay
+        self._buffer = []
+        self._handle = None
+        self._order = None
+        self._lock = threading.Lock()
+        self._flush_time = histogram("storage_flush_seconds", FAST_BUCKETS, file=route_template(path))
+        _logs.append(self)
+
+    def append(self, line):
+        self._buffer.append(line)
+        self._schedule()
+
+    def extend(self, lines):
+        """Plusieurs lignes d'un coup : une seule écriture, même hors de la boucle."""
+        self._buffer.extend(lines)
+        self._schedule()
+
+    def _schedule(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.flush_sync()
+        if self._handle is None:
+            self._handle = loop.call_later(self.delay, self._start_flush)
+
+    def read_lines(self):
+        lines = []
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = [line.rstrip("\n") for line in f if line.strip()]
+        return lines + self._buffer
+
+    def _start_flush(self):
+        self._handle = None
+        asyncio.ensure_future(self.flush())
+
+    def _take(self):
+        lines, self._buffer = self._buffer, []
+        return "".join(line + "\n" for line in lines)
+
+    def _write(self, payload):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+
+    async def flush(self):
+        if self._order is None:
+            self._order = asyncio.Lock()
+        # Le verrou garde l'ordre des lots quand deux flush se chevauchent.
+        async with self._order:
+            if not self._buffer:
+                return
+            payload = self._take()
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write, payload)
+            except Exception as e:
+                print(f"❌ Écriture {self.path} échouée : {e}", file=sys.stderr)
+                self._buffer[:0] = payload.splitlines()
+                self._schedule()
+            else:
+                self._flush_time.observe(time.perf_counter() - started)
+
+    def flush_sync(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._buffer:
+            self._write(self._take())
+
+    def close(self):
+        self.flush_sync()
+        if self in _logs:
+            _logs.remove(self)
+
+
+def get_store(path, default):
+    """Retourne le store partagé pour ce fichier (un seul par chemin)."""
+    store = _stores.get(path)
+    if store is None:
+        store = _stores[path] = JsonStore(path, default)
+    return store
+
+
+def flush_all():
+    for store in list(_stores.values()) + list(_logs):
+        try:
+            store.flush_sync()
+        except Exception as e:
+            print(f"❌ Écriture {store.path} échouée : {e}", file=sys.stderr)
+
+
+atexit.register(flush_all)
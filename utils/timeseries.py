@@ -0,0 +1,226 @@
+# utils/timeseries.py
+import asyncio
+import atexit
+import struct
+import time
+from array import array
+from collections import defaultdict
+
+from utils.storage import _atomic_write
+from utils.cluster import CLUSTER
+
+TIMESERIES_PATH = "data/timeseries.bin"
+SAVE_DELAY = 300.0
+
+# Paliers de résolution : (pas en secondes, nombre de cases).
+# 24h à la minute, 7j à l'heure, 30j par tranches de 4h.
+TIERS = ((60, 1440), (3600, 168), (14400, 180))
+PERIODS = {"24h": 0, "7j": 1, "30j": 2}
+
+# Salons suivis individuellement par serveur : les plus actifs sur 24h (space-saving).
+MAX_CHANNELS = 10
+# Salons non suivis dont on compte l'activité pour remplacer le moins actif.
+MAX_CANDIDATES = 2 * MAX_CHANNELS
+# Le salon le moins actif est recalculé au plus une fois par minute.
+FLOOR_TTL = 60.0
+
+SPARKS = "▁▂▃▄▅▆▇█"
+MAGIC = b"SKTS1"
+
+
+class Series:
+    """Une série sur tous les paliers : un tableau circulaire fixe par palier.
+
+    `kind` = "sum" (compteurs) ou "max" (jauges, ex. occupation vocale).
+    """
+
+    def __init__(self, kind="sum"):
+        self.kind = kind
+        self.rings = [array("I", bytes(4 * size)) for _, size in TIERS]
+        self.last = [0] * len(TIERS)
+
+    def _advance(self, tier, slot):
+        step, size = TIERS[tier]
+        ring = self.rings[tier]
+        last = self.last[tier]
+        if slot > last:
+            # Les cases sautées (aucune activité) sont remises à zéro
+            for s in range(max(last + 1, slot - size + 1), slot + 1):
+                ring[s % size] = 0
+            self.last[tier] = slot
+
+    def record(self, value=1, now=None):
+        now = now or time.time()
+        for tier, (step, size) in enumerate(TIERS):
+            slot = int(now // step)
+            self._advance(tier, slot)
+            if slot <= self.last[tier] - size:
+                continue
+            i = slot % size
+            ring = self.rings[tier]
+            value = min(value, 0xFFFFFFFF)
+            ring[i] = max(ring[i], value) if self.kind == "max" else min(ring[i] + value, 0xFFFFFFFF)
+
+    def values(self, tier, now=None):
+        """Valeurs du palier, de la plus ancienne à la plus récente."""
+        step, size = TIERS[tier]
+        self._advance(tier, int((now or time.time()) // step))
+        ring = self.rings[tier]
+        start = (self.last[tier] + 1) % size
+        return ring[start:] + ring[:start]
+
+    def total(self, tier):
+        return sum(self.values(tier))
+
+
+def sparkline(values, width=24, agg=sum):
+    """Regroupe les valeurs en `width` colonnes et les dessine en blocs."""
+    if not values:
+        return ""
+    chunk = max(1, len(values) // width)
+    columns = [agg(values[i:i + chunk]) for i in range(0, len(values) - chunk + 1, chunk)][-width:]
+    peak = max(columns)
+    if not peak:
+        return SPARKS[0] * len(columns)
+    return "".join(SPARKS[min(len(SPARKS) - 1, v * len(SPARKS) // (peak + 1))] for v in columns)
+
+
+class Recorder:
+    """Séries d'activité par serveur, en mémoire bornée, sauvegardées en binaire."""
+
+    def __init__(self, path=TIMESERIES_PATH):
+        self.path = path
+        self.series = {}
+        self.tracked_channels = defaultdict(set)
+        self.candidates = defaultdict(dict)
+        self.candidates_since = {}
+        self.floors = {}
+        self._handle = None
+        self._load()
+
+    def get(self, guild_id, name, kind="sum", value=1):
+        key = (int(guild_id), name)
+        series = self.series.get(key)
+        if series is None:
+            if name.startswith("ch:"):
+                if not self._admit(key[0], name, value):
+                    return None
+                self.tracked_channels[key[0]].add(name)
+            series = self.series[key] = Series(kind)
+        return series
+
+    def _admit(self, guild_id, name, value):
+        """Un salon non suivi remplace le moins actif dès qu'il le dépasse sur la fenêtre de 24h."""
+        tracked = self.tracked_channels[guild_id]
+        if len(tracked) < MAX_CHANNELS:
+            return True
+        now = time.time()
+        if now - self.candidates_since.setdefault(guild_id, now) >= TIERS[0][0] * TIERS[0][1]:
+            self.candidates[guild_id].clear()
+            self.candidates_since[guild_id] = now
+        counts = self.candidates[guild_id]
+        if name not in counts and len(counts) >= MAX_CANDIDATES:
+            # Space-saving : le nouveau venu reprend le compte du plus faible candidat
+            counts[name] = counts.pop(min(counts, key=counts.get))
+        counts[name] = counts.get(name, 0) + value
+        floor, victim = self._floor(guild_id, now)
+        if counts[name] <= floor:
+            return False
+        del self.series[(guild_id, victim)]
+        tracked.discard(victim)
+        del counts[name]
+        self.floors.pop(guild_id, None)
+        return True
+
+    def _floor(self, guild_id, now):
+        cached = self.floors.get(guild_id)
+        if cached is None or now - cached[2] >= FLOOR_TTL:
+            totals = {n: self.series[(guild_id, n)].total(0) for n in self.tracked_channels[guild_id]}
+            victim = min(totals, key=totals.get)
+            cached = self.floors[guild_id] = (totals[victim], victim, now)
+        return cached[0], cached[1]
+
+    def record(self, guild_id, name, value=1, kind="sum"):
+        series = self.get(guild_id, name, kind, value)
+        if series is not None:
+            series.record(value)
+            self._schedule()
+
+    def channels(self, guild_id):
+        return [(int(n[3:]), s) for (g, n), s in self.series.items() if g == int(guild_id) and n.startswith("ch:")]
+
+    def drop_guild(self, guild_id):
+        for key in [k for k in self.series if k[0] == int(guild_id)]:
+            del self.series[key]
+        for index in (self.tracked_channels, self.candidates, self.candidates_since, self.floors):
+            index.pop(int(guild_id), None)
+
+    # === PERSISTANCE ===
+    def _schedule(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._handle is None:
+            self._handle = loop.call_later(SAVE_DELAY, self._start_save)
+
+    def _start_save(self):
+        self._handle = None
+        payload = self._dump()
+        asyncio.ensure_future(asyncio.to_thread(_atomic_write, self.path, payload))
+
+    def _dump(self):
+        parts = [MAGIC, struct.pack("<I", len(self.series))]
+        for (guild_id, name), series in self.series.items():
+            raw = name.encode("utf-8")
+            parts.append(struct.pack("<QH", guild_id, len(raw)) + raw + series.kind[0].encode())
+            for tier in range(len(TIERS)):
+                parts.append(struct.pack("<Q", series.last[tier]))
+                parts.append(series.rings[tier].tobytes())
+        return b"".join(parts)
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return
+        if not payload.startswith(MAGIC):
+            return
+        pos = len(MAGIC)
+        (count,) = struct.unpack_from("<I", payload, pos)
+        pos += 4
+        for _ in range(count):
+            guild_id, length = struct.unpack_from("<QH", payload, pos)
+            pos += 10
+            name = payload[pos:pos + length].decode("utf-8")
+            kind = "max" if payload[pos + length:pos + length + 1] == b"m" else "sum"
+            pos += length + 1
+            series = Series(kind)
+            for tier, (_, size) in enumerate(TIERS):
+                (series.last[tier],) = struct.unpack_from("<Q", payload, pos)
+                pos += 8
+                series.rings[tier] = array("I", payload[pos:pos + 4 * size])
+                pos += 4 * size
+            self.series[(guild_id, name)] = series
+            if name.startswith("ch:"):
+                self.tracked_channels[guild_id].add(name)
+
+    def save_sync(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self.series:
+            _atomic_write(self.path, self._dump())
+
+
+_recorder = None
+
+
+def get_recorder():
+    global _recorder
+    if _recorder is None:
+        # Un fichier par processus en mode cluster : chacun ne voit que ses serveurs
+        _recorder = Recorder(TIMESERIES_PATH if CLUSTER is None else f"data/timeseries-{CLUSTER}.bin")
+        atexit.register(_recorder.save_sync)
+    return _recorder
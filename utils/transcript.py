@@ -0,0 +1,157 @@
+# utils/transcript.py
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+
+import discord
+
+from utils.storage import AppendLog
+
+TRANSCRIPTS_DIR = "data/transcripts"
+LIVE_DIR = os.path.join(TRANSCRIPTS_DIR, "live")
+PAGE_SIZE = 100
+
+
+def format_message(message):
+    line = f"[{message.created_at.strftime('%Y-%m-%d %H:%M')}] {message.author}: {message.content}"
+    for attachment in message.attachments:
+        line += f"\n    📎 {attachment.url}"
+    return line
+
+
+def archive_path(guild_id, number):
+    return os.path.join(TRANSCRIPTS_DIR, str(guild_id), f"{number}.txt.gz")
+
+
+class TranscriptWriter:
+    """Transcript compressé au fil de l'écriture ; les pages partent hors de la boucle."""
+
+    def __init__(self, path, header=None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.lines = 0
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        if header:
+            self._file.write(header + "\n\n")
+
+    def _write(self, lines):
+        self._file.write("\n".join(lines) + "\n")
+
+    async def write_page(self, lines):
+        if lines:
+            await asyncio.to_thread(self._write, lines)
+            self.lines += len(lines)
+
+    async def close(self):
+        await asyncio.to_thread(self._file.close)
+
+
+async def stream_history(channel, writer):
+    """Parcourt tout l'historique page par page : la mémoire reste bornée à une page."""
+    page = []
+    async for m in channel.history(limit=None, oldest_first=True):
+        if is_transcribed(m):
+            page.append(format_message(m))
+            if len(page) >= PAGE_SIZE:
+                await writer.write_page(page)
+                page = []
+    await writer.write_page(page)
+
+
+def is_transcribed(message):
+    return message.type == discord.MessageType.default and not message.author.bot
+
+
+class LiveTranscripts:
+    """Capture au fil de l'eau : un journal en ajout seul par ticket ouvert.
+
+    Chaque ligne du journal est une chaîne JSON (les messages peuvent contenir
+    des retours à la ligne). À la fermeture, le journal est simplement
+    recompressé : aucun appel à l'historique. Seuls les tickets dont la
+    capture a commencé à la création (`start`) ont un journal : il est alors
+    complet.
+    """
+
+    def __init__(self, directory=LIVE_DIR):
+        self.directory = directory
+        self.logs = {}
+        names = os.listdir(directory) if os.path.isdir(directory) else []
+        self.started = {name[:-4] for name in names if name.endswith(".log")}
+
+    def _path(self, channel_id):
+        return os.path.join(self.directory, f"{channel_id}.log")
+
+    def start(self, channel_id):
+        """Ouvre le journal d'un ticket qui vient d'être créé (fichier vide)."""
+        os.makedirs(self.directory, exist_ok=True)
+        open(self._path(channel_id), "a", encoding="utf-8").close()
+        self.started.add(channel_id)
+
+    def append(self, channel_id, message):
+        if channel_id not in self.started:
+            # Ticket ouvert avant la capture : le journal serait incomplet
+            return
+        log = self.logs.get(channel_id)
+        if log is None:
+            log = self.logs[channel_id] = AppendLog(self._path(channel_id))
+        log.append(json.dumps(format_message(message), ensure_ascii=False))
+
+    def has(self, channel_id):
+        return channel_id in self.started
+
+    async def _close(self, channel_id):
+        self.started.discard(channel_id)
+        log = self.logs.pop(channel_id, None)
+        if log is not None:
+            await log.flush()
+            log.close()
+
+    async def finalize(self, channel_id, path, header=None):
+        """Compresse le journal du ticket vers `path` et retourne le nombre de lignes."""
+        await self._close(channel_id)
+        return await asyncio.to_thread(self._compress, self._path(channel_id), path, header)
+
+    def _compress(self, source, path, header):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        count = 0
+        with open(source, "r", encoding="utf-8") as src, gzip.open(path, "wt", encoding="utf-8") as dst:
+            if header:
+                dst.write(header + "\n\n")
+            for line in src:
+                if line.strip():
+                    dst.write(json.loads(line) + "\n")
+                    count += 1
+        os.remove(source)
+        return count
+
+    async def discard(self, channel_id):
+        await self._close(channel_id)
+        try:
+            os.remove(self._path(channel_id))
+        except FileNotFoundError:
+            pass
+
+
+_live = None
+
+
+def get_live_transcripts():
+    global _live
+    if _live is None:
+        _live = LiveTranscripts()
+    return _live
+
+
+def temp_path(number):
+    fd, path = tempfile.mkstemp(prefix=f"ticket-{number}-", suffix=".txt.gz")
+    os.close(fd)
+    return path
+
+
+def as_file(path, number, limit):
+    """Fichier à envoyer, ou None s'il dépasse `limit` (guild.filesize_limit du salon cible)."""
+    if os.path.getsize(path) > limit:
+        return None
+    return discord.File(path, filename=f"ticket-{number}.txt.gz")